@@ -27,24 +27,677 @@ description:
   - This os10 plugin provides low level abstraction apis for
     sending and receiving CLI commands from FUJITSU PSWITCH.
 version_added: 2.10
+options:
+  command_cache:
+    description:
+      - Enables memoization of the output of read-only C(show) commands sent
+        through the C(get) and C(run_commands) rpc's, so that repeated
+        commands within a play are answered without a device round trip.
+      - The cache is cleared whenever a configuration rpc or any command
+        that is not known to be read-only is sent to the device.
+    type: boolean
+    default: False
+    vars:
+      - name: ansible_fos_command_cache
+  command_cache_ttl:
+    description:
+      - Number of seconds the output of a read-only command is kept in the
+        cache, for commands that do not have a built-in lifetime.
+    type: int
+    default: 60
+    vars:
+      - name: ansible_fos_command_cache_ttl
+  command_cache_size:
+    description:
+      - Maximum number of command outputs kept in the cache.  The least
+        recently used entries are evicted first.
+    type: int
+    default: 128
+    vars:
+      - name: ansible_fos_command_cache_size
+  config_cache:
+    description:
+      - Keeps the running config fetched by the C(get_config) rpc and patches
+        it with the commands pushed by C(edit_config), so that the following
+        tasks do not fetch the whole configuration again.
+      - The cached config is dropped whenever a pushed command can not be
+        modelled, e.g. an abbreviated command or a C(no) form of a line that
+        is not in the configuration, and whenever commands are pushed by
+        other means.
+    type: boolean
+    default: False
+    vars:
+      - name: ansible_fos_config_cache
+  config_cache_refresh:
+    description:
+      - Number of pushes after which the cached running config is fetched
+        again from the device, even when all the pushed commands were
+        modelled.
+    type: int
+    default: 10
+    vars:
+      - name: ansible_fos_config_cache_refresh
+  latency_dir:
+    description:
+      - Path to a local directory where the latency of the commands run on
+        each host is recorded, one file per host.  Once enough samples of a
+        command are recorded, its timeout is derived from them instead of
+        C(persistent_command_timeout), so that a dead session is detected
+        within seconds on quick commands while slow ones get the time they
+        need.
+      - Commands differing only by numbers, e.g. interface names, share
+        their samples.
+    type: path
+    vars:
+      - name: ansible_fos_latency_dir
+  latency_timeout_factor:
+    description:
+      - The timeout of a command is its 99th percentile latency multiplied
+        by this factor.
+    type: float
+    default: 3
+    vars:
+      - name: ansible_fos_latency_timeout_factor
+  latency_min_timeout:
+    description:
+      - Lower bound, in seconds, of the timeouts derived from the latency.
+    type: int
+    default: 5
+    vars:
+      - name: ansible_fos_latency_min_timeout
+  push_window:
+    description:
+      - Maximum number of config lines sent by C(edit_config) before the
+        device returns to the prompt.  The window starts at one line and
+        widens while the latency per line stays low, it narrows when the
+        device lags.
+      - Requires the C(paramiko) I(ssh_type), the libssh one does not keep
+        the whole response of the device, lines are sent one at a time
+        with it.
+      - The default of one line waits for the prompt after every line.
+        Set it per model, e.g. in the group vars of the groups created by
+        the C(fujitsu.fos.fos_facts) inventory plugin.
+    type: int
+    default: 1
+    vars:
+      - name: ansible_fos_push_window
+  broker_socket:
+    description:
+      - Path to the Unix socket of the local session broker, see
+        C(scripts/fos_broker.py).  The commands are
+        then run on a session leased from the broker, which keeps it open
+        for the next runs, instead of on an SSH session opened by the
+        connection.
+      - When the broker can not be reached the connection opens its own
+        session, with a warning.
+      - Config lines are not sent ahead of the prompt on a leased session,
+        I(push_window) is ignored.
+    type: path
+    vars:
+      - name: ansible_fos_broker_socket
+  read_channels:
+    description:
+      - Number of extra shells opened next to the primary one, on the same
+        SSH connection, to run read-only commands.  The C(run_commands) rpc
+        spreads a batch made of C(show) commands only across them, while
+        the configuration rpc's and any other command stay on the primary
+        shell.
+      - The shells are opened on the first such batch and kept for the
+        life of the connection.  Fewer are used when the device refuses to
+        open more.  Requires the C(paramiko) I(ssh_type) and is ignored on
+        a session leased from the broker.
+    type: int
+    default: 0
+    vars:
+      - name: ansible_fos_read_channels
 """
 
-import re
+import atexit
 import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from functools import wraps
 
-from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import load_running_config
-from ansible.errors import AnsibleConnectionFailure
-from ansible.module_utils._text import to_text
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_config_diff, parse_fields, apply_commands
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_parents, write_checkpoint, compact_commands
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_prompts, get_unknown_prompt, CONFIRM_PROMPT_ANSWER
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_broker import BrokerClient, BrokerError, Session
+from ansible.errors import AnsibleConnectionFailure, AnsibleError
+from ansible.module_utils._text import to_bytes, to_text
 from ansible.module_utils.common._collections_compat import Mapping
-from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.config import NetworkConfig, dumps
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.utils import to_list
-from ansible.plugins.cliconf import CliconfBase, enable_mode
+from ansible.plugins.cliconf import CliconfBase
+
+
+# Commands whose output depends only on the device state and never changes it.
+READONLY_COMMANDS = ('show ',)
+
+# Built-in lifetime, in seconds, of the cached output of some read-only
+# commands.  Output that only changes on reload is kept for long, while
+# counters and utilization figures are never cached.
+COMMAND_CACHE_TTLS = (
+    ('show version', 3600),
+    ('show hardware', 3600),
+    ('show process cpu', 0),
+)
+
+
+# Copies the running config to the startup config, the device asks for a
+# confirmation and writes the flash before it returns to the prompt.
+SAVE_COMMAND = 'copy system:running-config nvram:startup-config'
+SAVE_ANSWER = 'y'
+
+
+def is_read_only(command):
+    return command.strip().startswith(READONLY_COMMANDS)
+
+
+def enable_mode(func):
+    """Same as the one of CliconfBase, with the prompt of a leased session"""
+    @wraps(func)
+    def wrapped(self, *args, **kwargs):
+        prompt = self._get_prompt()
+        if not to_text(prompt, errors='surrogate_or_strict').strip().endswith('#'):
+            raise AnsibleError('operation requires privilege escalation')
+        return func(self, *args, **kwargs)
+    return wrapped
+
+
+class LatencyHistory(object):
+    """Recent latencies of the commands run on a host, kept in a local file"""
+
+    SAMPLES = 100
+    MIN_SAMPLES = 20
+    SAVE_EVERY = 10
+
+    def __init__(self, path, warn=None):
+        self.path = path
+        self.warn = warn
+        self.unsaved = 0
+        try:
+            with open(path) as f:
+                self.samples = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.samples = dict()
+
+    @staticmethod
+    def get_key(command):
+        return re.sub(r'\d+', 'N', command.strip())
+
+    def percentile(self, command, percent):
+        samples = sorted(self.samples.get(self.get_key(command), ()))
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        return samples[int(math.ceil(len(samples) * percent / 100.0)) - 1]
+
+    def record(self, command, latency):
+        samples = self.samples.setdefault(self.get_key(command), [])
+        samples.append(round(latency, 3))
+        del samples[:-self.SAMPLES]
+
+        self.unsaved += 1
+        if self.unsaved >= self.SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        if not self.unsaved:
+            return
+
+        # the samples are kept in memory when they can not be written, the
+        # commands they were measured on went through
+        self.unsaved = 0
+        tmp_path = '%s.tmp' % self.path
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.samples, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as exc:
+            if self.warn is not None:
+                self.warn('unable to record the command latencies in %s: %s' % (self.path, to_text(exc)))
+                self.warn = None
+
+
+class CommandCache(object):
+    """Least recently used store of command outputs with per-entry expiry"""
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+
+    def lookup(self, command):
+        try:
+            expires, output = self._entries.pop(command)
+        except KeyError:
+            return None
+
+        if expires < time.time():
+            return None
+
+        self._entries[command] = (expires, output)
+        return output
+
+    def populate(self, command, output, ttl):
+        self._entries.pop(command, None)
+        if ttl <= 0:
+            return
+
+        self._entries[command] = (time.time() + ttl, output)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._entries.clear()
+
+
+def is_echoed(received, commands):
+    """Tells whether the device echoed all the commands, in order"""
+    position = 0
+    for command in commands:
+        position = received.find(command.strip(), position)
+        if position < 0:
+            return False
+        position += len(command.strip())
+    return True
+
+
+class PushWindow(object):
+    """Number of config lines sent ahead of the device prompt
+
+    The window grows by one line while the latency per line stays close to
+    the best one measured so far, and is halved as soon as the device lags.
+    """
+
+    def __init__(self, ceiling):
+        self.ceiling = max(ceiling, 1)
+        self.size = 1
+        self.best = None
+
+    def update(self, count, elapsed):
+        latency = elapsed / count
+        if self.best is None or latency < self.best:
+            self.best = latency
+
+        if latency <= self.best * 1.5:
+            self.size = min(self.size + 1, self.ceiling)
+        else:
+            self.size = max(self.size // 2, 1)
+
+
+class ChannelPool(object):
+    """Extra shells running read-only commands next to the primary one"""
+
+    def __init__(self, size, open_channel, request):
+        self.size = size
+        self.open_channel = open_channel
+        self.request = request
+        self.sessions = list()
+
+    def grow(self, count):
+        while len(self.sessions) < min(count, self.size):
+            session = Session(None)
+            try:
+                session.open(self.open_channel, self.request)
+            except Exception:
+                # the device limits the number of sessions, the ones open are kept
+                session.close()
+                self.size = len(self.sessions)
+                break
+            self.sessions.append(session)
+
+    def run(self, commands, timeout):
+        """Runs the commands spread across the shells
+
+        Returns the output, or the BrokerError, of each command, and None for
+        the commands left over when all the shells were lost.
+        """
+        self.grow(len(commands))
+        results = [None] * len(commands)
+        pending = list(reversed(list(enumerate(commands))))
+        lock = threading.Lock()
+
+        def worker(session):
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    index, command = pending.pop()
+                try:
+                    results[index] = session.send(command, timeout=timeout)
+                except BrokerError as exc:
+                    if not session.is_alive():
+                        with lock:
+                            pending.append((index, command))
+                        return
+                    results[index] = exc
+
+        threads = [threading.Thread(target=worker, args=(session,)) for session in self.sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.sessions = [session for session in self.sessions if session.is_alive()]
+        return results
 
 
 class Cliconf(CliconfBase):
 
+    def __init__(self, *args, **kwargs):
+        super(Cliconf, self).__init__(*args, **kwargs)
+        self._command_cache = None
+        self._latency = None
+        self._running_config = None
+        self._config_pushes = 0
+        self._pending_save = None
+        self._save_results = OrderedDict()
+        self._broker = None
+        self._broker_prompt = None
+        self._device_info = None
+        self._channel_pool = None
+        self._config_queue = list()
+
+    def _get_command_cache(self):
+        if not self.get_option('command_cache'):
+            return None
+        if self._command_cache is None:
+            self._command_cache = CommandCache(self.get_option('command_cache_size'))
+        return self._command_cache
+
+    def _get_command_ttl(self, command):
+        for prefix, ttl in COMMAND_CACHE_TTLS:
+            if command.startswith(prefix):
+                return ttl
+        return self.get_option('command_cache_ttl')
+
+    def _get_latency_history(self):
+        if not self.get_option('latency_dir'):
+            return None
+        if self._latency is None:
+            host = self._connection.get_option('host')
+            self._latency = LatencyHistory(os.path.join(self.get_option('latency_dir'), '%s.json' % host),
+                                           lambda msg: self._connection.queue_message('warning', msg))
+            # the samples not written yet are written when the connection process exits
+            atexit.register(self._latency.save)
+        return self._latency
+
+    def _get_broker(self):
+        """Returns the broker client when the session is leased from the broker"""
+        if self._broker is None:
+            self._broker = False
+            if self.get_option('broker_socket'):
+                self._open_broker_session()
+        return self._broker or None
+
+    def _open_broker_session(self):
+        get_option = self._connection.get_option
+        play_context = self._connection._play_context
+        request = dict(host=get_option('host'), port=get_option('port'), username=get_option('remote_user'),
+                       password=get_option('password'), private_key_file=get_option('private_key_file'),
+                       host_key_checking=get_option('host_key_checking'), host_key_auto_add=get_option('host_key_auto_add'),
+                       become=play_context.become, become_pass=play_context.become_pass,
+                       timeout=get_option('persistent_connect_timeout'))
+        try:
+            broker = BrokerClient(self.get_option('broker_socket'))
+            session = broker.call('open', **request)
+        except BrokerError as exc:
+            self._connection.queue_message('warning', 'not using the session broker: %s' % to_text(exc))
+            return
+
+        self._broker = broker
+        self._broker_prompt = session['prompt']
+        self._device_info = session['device_info']
+
+    def _get_prompt(self):
+        if self._get_broker() is not None:
+            return to_bytes(self._broker_prompt, errors='surrogate_or_strict')
+        return self._connection.get_prompt()
+
+    def _send(self, command, prompt=None, answer=None, sendonly=False, newline=True, prompt_retry_check=False, check_all=False):
+        broker = self._get_broker()
+        if broker is None:
+            return super(Cliconf, self).send_command(command, prompt, answer, sendonly, newline, prompt_retry_check, check_all)
+
+        try:
+            reply = broker.call('send', command=to_text(command, errors='surrogate_or_strict'),
+                                prompt=[to_text(p, errors='surrogate_or_strict') for p in to_list(prompt)],
+                                answer=[to_text(a, errors='surrogate_or_strict') for a in to_list(answer)],
+                                sendonly=sendonly, newline=newline,
+                                timeout=self._connection.get_option('persistent_command_timeout'))
+        except BrokerError as exc:
+            raise AnsibleConnectionFailure(to_text(exc))
+        if not sendonly:
+            self._broker_prompt = reply['prompt']
+        return reply['output']
+
+    def _receive(self):
+        broker = self._get_broker()
+        if broker is None:
+            return self._connection.receive()
+
+        try:
+            reply = broker.call('receive', timeout=self._connection.get_option('persistent_command_timeout'))
+        except BrokerError as exc:
+            raise AnsibleConnectionFailure(to_text(exc))
+        self._broker_prompt = reply['prompt']
+        return reply['output']
+
+    def _get_ssh_type(self):
+        # network_cli of ansible.netcommon before 1.3.0 always used paramiko
+        return getattr(self._connection, 'ssh_type', 'paramiko')
+
+    def _get_channel_pool(self):
+        if not self.get_option('read_channels') or self._get_broker() is not None:
+            return None
+        if self._channel_pool is None:
+            self._channel_pool = False
+            if self._get_ssh_type() == 'paramiko':
+                play_context = self._connection._play_context
+                request = dict(become=play_context.become, become_pass=play_context.become_pass,
+                               timeout=self._connection.get_option('persistent_connect_timeout'))
+                self._channel_pool = ChannelPool(self.get_option('read_channels'), self._open_channel, request)
+            else:
+                self._connection.queue_message('warning', 'read_channels requires the paramiko ssh_type, ignored')
+        return self._channel_pool or None
+
+    def _open_channel(self, request):
+        # the shells share the SSH connection of the primary one
+        self._connection.get_prompt()
+        ssh_conn = getattr(self._connection, 'ssh_type_conn', None) or self._connection.paramiko_conn
+        return None, ssh_conn.ssh.invoke_shell()
+
+    def _run_read_only(self, commands):
+        """Runs a batch made of read-only commands alone on the channel pool
+
+        Other batches are left to the primary shell, so that no command is
+        reordered with one changing the device.  Returns the output, or the
+        error, of the commands run by their index in the batch.
+        """
+        pool = self._get_channel_pool()
+        if pool is None or len(commands) < 2:
+            return {}
+        if not all(list(cmd) == ['command'] and is_read_only(to_text(cmd['command'])) for cmd in commands):
+            return {}
+
+        cache = self._get_command_cache()
+        keys = list()
+        for cmd in commands:
+            key = to_text(cmd['command'], errors='surrogate_or_strict').strip()
+            if key not in keys and (cache is None or cache.lookup(key) is None):
+                keys.append(key)
+        if len(keys) < 2:
+            return {}
+
+        self._finish_save()
+        results = dict(zip(keys, pool.run(keys, self._connection.get_option('persistent_command_timeout'))))
+        if cache is not None:
+            for key, out in results.items():
+                if out is not None and not isinstance(out, BrokerError):
+                    cache.populate(key, out, self._get_command_ttl(key))
+
+        outputs = dict()
+        for index, cmd in enumerate(commands):
+            out = results.get(to_text(cmd['command'], errors='surrogate_or_strict').strip())
+            if out is not None:
+                outputs[index] = out
+        return outputs
+
+    def _send_timed_command(self, command=None, **kwargs):
+        """Sends a command with a timeout derived from its past latency"""
+        history = self._get_latency_history()
+        if history is None or kwargs.get('sendonly'):
+            return self.send_command(command, **kwargs)
+
+        key = to_text(command, errors='surrogate_or_strict')
+        default_timeout = self._connection.get_option('persistent_command_timeout')
+        p99 = history.percentile(key, 99)
+        if p99 is not None:
+            timeout = max(p99 * self.get_option('latency_timeout_factor'), self.get_option('latency_min_timeout'))
+            self._connection.set_option('persistent_command_timeout', int(math.ceil(timeout)))
+
+        started = time.time()
+        try:
+            out = self.send_command(command, **kwargs)
+        finally:
+            self._connection.set_option('persistent_command_timeout', default_timeout)
+        history.record(key, time.time() - started)
+        return out
+
+    def _send_cached_command(self, command=None, prompt=None, sendonly=False, **kwargs):
+        cache = self._get_command_cache()
+        key = to_text(command, errors='surrogate_or_strict').strip()
+        if not is_read_only(key):
+            if cache is not None:
+                cache.invalidate()
+            # saving leaves the running config as it is
+            if key != SAVE_COMMAND:
+                self._running_config = None
+        elif cache is not None and not (prompt or sendonly):
+            out = cache.lookup(key)
+            if out is None:
+                out = self._send_timed_command(command=command, **kwargs)
+                cache.populate(key, out, self._get_command_ttl(key))
+            return out
+
+        return self._send_timed_command(command=command, prompt=prompt, sendonly=sendonly, **kwargs)
+
+    def clear_command_cache(self):
+        if self._command_cache is not None:
+            self._command_cache.invalidate()
+
+    def _update_running_config(self, commands):
+        if self._running_config is None:
+            return
+
+        self._config_pushes += 1
+        if self._config_pushes < self.get_option('config_cache_refresh'):
+            self._running_config = apply_commands(self._running_config, commands)
+        else:
+            self._running_config = None
+
+    def _finish_save(self):
+        """Waits for the pending save to return to the prompt and records its outcome"""
+        if self._pending_save is None:
+            return
+
+        token, started = self._pending_save
+        self._pending_save = None
+        try:
+            self._receive()
+            status = dict(saved=True)
+        except AnsibleConnectionFailure as exc:
+            status = dict(saved=False, msg=to_text(exc))
+        status['elapsed'] = time.time() - started
+
+        self._save_results[token] = status
+        while len(self._save_results) > 16:
+            self._save_results.popitem(last=False)
+
+    def send_command(self, command=None, prompt=None, answer=None, sendonly=False, newline=True, prompt_retry_check=False, check_all=False):
+        # the output of a running save must not be mistaken for the response
+        # of the next command
+        self._finish_save()
+        if sendonly or check_all:
+            return self._send(command, prompt, answer, sendonly, newline, prompt_retry_check, check_all)
+
+        prompts, answers = get_prompts(to_text(command, errors='surrogate_or_strict'), prompt, answer)
+        out = self._send(command, prompts, answers, sendonly, newline, prompt_retry_check, check_all)
+
+        unknown = get_unknown_prompt(to_text(out, errors='surrogate_or_strict'), prompts[:-1])
+        if unknown:
+            raise AnsibleConnectionFailure('%s asked an unexpected question, answered %s: %s'
+                                           % (to_text(command), CONFIRM_PROMPT_ANSWER, unknown))
+        return out
+
     @enable_mode
-    def edit_config(self, candidate=None, commit=True, replace=None, comment=None):
+    def start_save(self):
+        """Starts copying the running config to the startup config
+
+        Returns at once with a token, the outcome of the save is collected
+        by get_save_status or before the next command is sent to the device.
+        """
+        self.send_command(SAVE_COMMAND, sendonly=True)
+        self.send_command(SAVE_ANSWER, sendonly=True)
+
+        token = uuid.uuid4().hex
+        self._pending_save = (token, time.time())
+        return token
+
+    def get_save_status(self, token=None):
+        if token is None:
+            if self._pending_save is not None:
+                token = self._pending_save[0]
+            elif self._save_results:
+                token = next(reversed(self._save_results))
+            else:
+                raise ValueError('no save was started on this connection')
+
+        if self._pending_save is not None and self._pending_save[0] == token:
+            self._finish_save()
+
+        try:
+            status = dict(self._save_results[token])
+        except KeyError:
+            raise ValueError('unknown save token %s' % token)
+        status['token'] = token
+        return status
+
+    def _send_window(self, commands):
+        """Sends commands ahead of the prompt and returns their output
+
+        Only the last command waits for the prompt, the output is read until
+        the device echoed all the commands, so that a prompt matched in
+        between is not taken for the end of the window.
+        """
+        for command in commands[:-1]:
+            self.send_command(command, sendonly=True)
+        output = to_text(self.send_command(commands[-1]), errors='surrogate_or_strict')
+        if len(commands) == 1:
+            return output
+
+        received = to_text(self._connection._last_response, errors='surrogate_or_strict')
+        while not is_echoed(received, commands):
+            output += '\n' + to_text(self._connection.receive(), errors='surrogate_or_strict')
+            received += to_text(self._connection._last_response, errors='surrogate_or_strict')
+        return output
+
+    @enable_mode
+    def edit_config(self, candidate=None, commit=True, replace=None, comment=None, checkpoint=None, digest=None, start=0,
+                    modes=None):
+        """Pushes the candidate commands in Global Config mode
+
+        With checkpoint, the number of acknowledged lines of the candidate is
+        written to that file after each line, along with its digest, and the
+        file is removed once the push completes.  The push begins at line
+        start of the candidate, once the modes that line is pushed in are
+        entered again, modes lists the lines entering a mode that neither
+        is_parents nor the indentation tell.
+        """
         resp = {}
         operations = self.get_device_operations()
         self.check_edit_config_capability(operations, candidate, commit, replace, comment)
@@ -52,18 +705,67 @@ class Cliconf(CliconfBase):
         results = []
         requests = []
         if commit:
-            if not self._connection.get_prompt().endswith(b'(Config)#'):
+            self.clear_command_cache()
+            # the cached running config is dropped until all the commands went through
+            running_config, self._running_config = self._running_config, None
+            if not self._get_prompt().endswith(b'(Config)#'):
                 self.send_command('configure')
-            for line in to_list(candidate):
+
+            candidate = to_list(candidate)
+            for parent in get_parents(candidate, start, modes) if start else ():
+                results.append(self.send_command(parent))
+                requests.append(parent)
+
+            # the end of a window is told from the whole response, which only
+            # the paramiko shell keeps, a leased session only relays the output
+            # up to the prompt
+            ceiling = 1
+            if self._get_ssh_type() == 'paramiko' and self._get_broker() is None:
+                ceiling = self.get_option('push_window')
+            window = PushWindow(ceiling)
+            pending = list()
+
+            def flush():
+                if not pending:
+                    return
+                commands = [candidate[i]['command'] if isinstance(candidate[i], Mapping) else candidate[i] for i in pending]
+                started = time.time()
+                output = self._send_window(commands)
+                window.update(len(commands), time.time() - started)
+                results.extend([''] * (len(commands) - 1) + [output])
+                requests.extend(commands)
+                if checkpoint:
+                    write_checkpoint(checkpoint, digest, pending[-1] + 1)
+                del pending[:]
+
+            for index in range(start, len(candidate)):
+                line = candidate[index]
                 if not isinstance(line, Mapping):
                     line = {'command': line}
 
                 cmd = line['command']
-                if cmd != 'end' and cmd[0] != '!':
+                if cmd == 'end' or cmd[0] == '!':
+                    continue
+
+                if len(line) > 1:
+                    # commands answering prompts are never sent ahead
+                    flush()
                     results.append(self.send_command(**line))
                     requests.append(cmd)
+                    if checkpoint:
+                        write_checkpoint(checkpoint, digest, index + 1)
+                    continue
+
+                pending.append(index)
+                if len(pending) >= window.size:
+                    flush()
+            flush()
 
             self.send_command('end')
+            if checkpoint and os.path.exists(checkpoint):
+                os.remove(checkpoint)
+            self._running_config = running_config
+            self._update_running_config(requests)
         else:
             raise ValueError('check mode is not supported')
 
@@ -71,6 +773,81 @@ class Cliconf(CliconfBase):
         resp['response'] = results
         return resp
 
+    def queue_config(self, candidate=None, diff_match='line', path=None, diff_replace='line', before=None, after=None, commands=None):
+        """Queues a change until flush_config, returns its id
+
+        The change is either a candidate, diffed against the running config
+        when flushed, or commands pushed as they are.  The ids are unique
+        across connections, so that the changes lost with a connection are
+        not mistaken for the ones queued on a new one.
+        """
+        queue_id = uuid.uuid4().hex
+        self._config_queue.append(dict(id=queue_id, candidate=candidate, diff_match=diff_match, path=path,
+                                       diff_replace=diff_replace, before=before, after=after, commands=commands))
+        return queue_id
+
+    def flush_config(self, queue_ids=None):
+        """Diffs the queued changes against one running config and pushes them at once
+
+        Each change is diffed against the running config patched with the
+        changes queued before it.  When a change can not be modelled, such as
+        a command overriding a line apply_commands does not know, the
+        commands so far are pushed and the running config fetched again
+        before the next change is diffed.  With queue_ids, nothing is pushed
+        unless all those changes are still queued.
+
+        Returns the pushed commands and, for each change, its id and commands.
+        """
+        queue, self._config_queue = self._config_queue, list()
+        if queue_ids is not None:
+            missing = set(queue_ids) - set(item['id'] for item in queue)
+            if missing:
+                raise ValueError('%d of the queued changes were lost, the connection was reset or timed out since'
+                                 ' they were queued: %s' % (len(missing), ', '.join(sorted(missing))))
+
+        results = list()
+        pushed = list()
+        pending = list()
+
+        def push():
+            commands = compact_commands(pending)
+            if commands:
+                self.edit_config(commands)
+                pushed.extend(commands)
+            del pending[:]
+
+        def fetch():
+            return to_text(self.get_config(), errors='surrogate_or_strict').split('\n')
+
+        running = None
+        if any(item['candidate'] is not None for item in queue):
+            running = fetch()
+
+        for item in queue:
+            task_commands = list(item['commands'] or ())
+            if item['candidate'] is not None:
+                if running is None:
+                    push()
+                    running = fetch()
+                diff = self.get_diff(candidate=item['candidate'], running='\n'.join(running), diff_match=item['diff_match'],
+                                     path=item['path'], diff_replace=item['diff_replace'])
+                task_commands = diff['config_diff'].split('\n') if diff['config_diff'] else []
+                if task_commands:
+                    task_commands = list(item['before'] or ()) + task_commands + list(item['after'] or ())
+
+            results.append(dict(id=item['id'], commands=task_commands, changed=bool(task_commands)))
+            if not task_commands:
+                continue
+            pending.extend(task_commands)
+            # the next change starts from Global Config mode
+            pending.extend(['exit'] * len(get_parents(task_commands, len(task_commands), item['path'])))
+            if running is not None:
+                # None when the change can not be modelled
+                running = apply_commands(running, task_commands)
+
+        push()
+        return dict(commands=pushed, results=results)
+
     @enable_mode
     def edit_vlan(self, candidate=None, commit=True, replace=None, comment=None):
         resp = {}
@@ -80,7 +857,9 @@ class Cliconf(CliconfBase):
         results = []
         requests = []
         if commit:
-            if not self._connection.get_prompt().endswith(b'(Vlan)#'):
+            self.clear_command_cache()
+            self._running_config = None
+            if not self._get_prompt().endswith(b'(Vlan)#'):
                 self.send_command('vlan database')
             for line in to_list(candidate):
                 if not isinstance(line, Mapping):
@@ -105,11 +884,12 @@ class Cliconf(CliconfBase):
         if output:
             raise ValueError("'output' value %s is not supported for get" % output)
 
-        return self.send_command(command=command, prompt=prompt, answer=answer, sendonly=sendonly, newline=newline, check_all=check_all)
+        return self._send_cached_command(command=command, prompt=prompt, answer=answer, sendonly=sendonly, newline=newline, check_all=check_all)
 
     def get_capabilities(self):
         result = super(Cliconf, self).get_capabilities()
-        result['rpc'] += ['get_diff', 'run_commands', 'get_defaults_flag']
+        result['rpc'] += ['get_diff', 'run_commands', 'get_defaults_flag', 'clear_command_cache',
+                          'start_save', 'get_save_status', 'queue_config', 'flush_config']
         result['device_operations'] = self.get_device_operations()
         result.update(self.get_option_values())
         return json.dumps(result)
@@ -132,7 +912,14 @@ class Cliconf(CliconfBase):
         cmd += ' '.join(to_list(flags))
         cmd = cmd.strip()
 
-        return self.send_command(cmd)
+        if source == 'running' and not flags and self.get_option('config_cache'):
+            if self._running_config is None:
+                out = to_text(self._send_timed_command(cmd), errors='surrogate_or_strict')
+                self._running_config = out.split('\n')
+                self._config_pushes = 0
+            return '\n'.join(self._running_config)
+
+        return self._send_timed_command(cmd)
 
     def get_defaults_flag(self):
         out = self.get('show running-config ?')
@@ -149,32 +936,41 @@ class Cliconf(CliconfBase):
             return 'full'
 
     def get_device_info(self):
+        if self._device_info:
+            return dict(self._device_info)
+
         device_info = {}
 
         device_info['network_os'] = 'fos'
-        if self._connection.get_prompt().endswith(b'>'):
+        if self._get_prompt().endswith(b'>'):
             reply = self.get(command='enable')
         reply = self.get(command='show version')
         data = to_text(reply, errors='surrogate_or_strict').strip()
-        match = re.search(r'^Current Runtime Version\.+ (.+)', data, re.M)
-        if match:
-            device_info['network_os_version'] = match.group(1)
+        fields = parse_fields(data)
+        if 'Current Runtime Version' in fields:
+            device_info['network_os_version'] = fields['Current Runtime Version']
 
         reply = self.get(command='show hardware')
         data = to_text(reply, errors='surrogate_or_strict').strip()
-        match = re.search(r'^Machine Type[\.]+ \s*(.+)', data)
-        if match:
-            device_info['network_os_type'] = match.group(1)
-        match = re.search(r'^Machine Model[\.]+ \s*(.+)', data)
-        if match:
-            device_info['network_os_model'] = match.group(1)
+        fields = parse_fields(data)
+        if 'Machine Type' in fields:
+            device_info['network_os_type'] = fields['Machine Type']
+        if 'Machine Model' in fields:
+            device_info['network_os_model'] = fields['Machine Model']
 
         reply = self.get(command='show hosts')
         data = to_text(reply, errors='surrogate_or_strict').strip()
-        match = re.search(r'^Host name\.+ (.+)', data, re.M)
-        if match:
-            device_info['network_os_hostname'] = match.group(1)
+        fields = parse_fields(data)
+        if 'Host name' in fields:
+            device_info['network_os_hostname'] = fields['Host name']
 
+        broker = self._get_broker()
+        if broker is not None:
+            # kept with the session for the next runs
+            try:
+                broker.call('set_device_info', device_info=device_info)
+            except BrokerError as exc:
+                raise AnsibleConnectionFailure(to_text(exc))
         return device_info
 
     def get_device_operations(self):
@@ -202,21 +998,7 @@ class Cliconf(CliconfBase):
         if diff_replace not in option_values['diff_replace']:
             raise ValueError("'replace' value %s in invalid, valid values are %s" % (diff_replace, ', '.join(option_values['diff_replace'])))
 
-        # prepare candidate configuration
-        candidate_obj = NetworkConfig(indent=4, contents=candidate)
-
-        if running and diff_match != "none" and diff_replace != "config":
-            running_obj = load_running_config(running=running)
-            configdiffobjs = candidate_obj.difference(
-                running_obj, path=path, match=diff_match, replace=diff_replace
-            )
-
-        else:
-            configdiffobjs = candidate_obj.items
-
-        diff["config_diff"] = (
-            dumps(configdiffobjs, "commands") if configdiffobjs else ""
-        )
+        diff["config_diff"] = get_config_diff(candidate, running, diff_match, path, diff_replace)
 
         return diff
 
@@ -232,17 +1014,21 @@ class Cliconf(CliconfBase):
         if commands is None:
             raise ValueError("'commands' value is required")
 
-        responses = list()
-        for cmd in to_list(commands):
-            if not isinstance(cmd, Mapping):
-                cmd = {'command': cmd}
-
+        commands = [cmd if isinstance(cmd, Mapping) else {'command': cmd} for cmd in to_list(commands)]
+        for cmd in commands:
             output = cmd.pop('output', None)
             if output:
                 raise ValueError("'output' value %s is not supported for run_commands" % output)
 
+        outputs = self._run_read_only(commands)
+        responses = list()
+        for index, cmd in enumerate(commands):
             try:
-                out = self.send_command(**cmd)
+                out = outputs.get(index)
+                if out is None:
+                    out = self._send_cached_command(**cmd)
+                elif isinstance(out, BrokerError):
+                    raise AnsibleConnectionFailure(to_text(out))
             except AnsibleConnectionFailure as e:
                 if check_rc:
                     raise
@@ -256,4 +1042,6 @@ class Cliconf(CliconfBase):
     def send_data(self, data=None):
         if data is None:
             return
+        self.clear_command_cache()
+        self._running_config = None
         self.send_command(data, sendonly=True)
@@ -0,0 +1,137 @@
+#
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = """
+---
+name: fos_facts
+plugin_type: inventory
+short_description: Build an inventory of FUJITSU PSWITCH from stored facts
+description:
+  - Builds hosts, host variables and groups from the facts persisted by
+    M(fos_facts) with the I(cache_dir) option, without connecting to any
+    device.
+  - Files written by the C(jsonfile) fact cache plugin are read as well.
+  - The name of each file, without its C(.json) extension, is used as the
+    host name, so that hosts merge with the ones of the other inventory
+    sources.
+  - Uses a YAML configuration file that ends with C(fos_facts.yml) or
+    C(fos_facts.yaml).
+version_added: 2.10
+extends_documentation_fragment:
+  - constructed
+options:
+  plugin:
+    description: Token that ensures this is a source file for the C(fos_facts) plugin.
+    required: True
+    choices: ['fujitsu.fos.fos_facts']
+  cache_dir:
+    description:
+      - Path to the directory holding the stored facts, one file per host.
+    type: path
+    required: True
+  exclude_facts:
+    description:
+      - Facts that are not set as host variables.
+    type: list
+    elements: str
+    default: ['ansible_net_config']
+"""
+
+EXAMPLES = """
+# fos_facts.yml
+plugin: fujitsu.fos.fos_facts
+cache_dir: /var/cache/fos_facts
+keyed_groups:
+  - key: ansible_net_model
+    prefix: model
+  - key: ansible_net_runtime_version
+    prefix: runtime
+groups:
+  lab: ansible_net_hostname.startswith('lab')
+"""
+
+import json
+import os
+
+from ansible.errors import AnsibleParserError
+from ansible.module_utils._text import to_native
+from ansible.plugins.inventory import BaseInventoryPlugin, Constructable
+from ansible.utils.display import Display
+
+display = Display()
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable):
+
+    NAME = 'fujitsu.fos.fos_facts'
+
+    def verify_file(self, path):
+        if super(InventoryModule, self).verify_file(path):
+            return path.endswith(('fos_facts.yml', 'fos_facts.yaml'))
+        return False
+
+    def load_facts(self, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError) as exc:
+            display.warning('Skipping %s: %s' % (path, to_native(exc)))
+            return None
+
+        if not isinstance(data, dict):
+            return None
+
+        # fos_facts stores its facts next to the cached outputs
+        if 'fingerprint' in data and 'facts' in data:
+            data = data['facts']
+        return data
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        cache_dir = self.get_option('cache_dir')
+        exclude_facts = self.get_option('exclude_facts') or list()
+        strict = self.get_option('strict')
+
+        try:
+            filenames = sorted(os.listdir(cache_dir))
+        except OSError as exc:
+            raise AnsibleParserError('Unable to read %s: %s' % (cache_dir, to_native(exc)))
+
+        for filename in filenames:
+            if filename.startswith('.') or filename.endswith('.tmp'):
+                continue
+
+            facts = self.load_facts(os.path.join(cache_dir, filename))
+            if facts is None:
+                continue
+
+            host = filename[:-len('.json')] if filename.endswith('.json') else filename
+            self.inventory.add_host(host)
+
+            for key, value in facts.items():
+                if key not in exclude_facts:
+                    self.inventory.set_variable(host, key, value)
+
+            self._set_composite_vars(self.get_option('compose'), facts, host, strict=strict)
+            self._add_host_to_composed_groups(self.get_option('groups'), facts, host, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option('keyed_groups'), facts, host, strict=strict)
@@ -0,0 +1,124 @@
+#
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = """
+---
+name: fos_backup
+plugin_type: lookup
+short_description: Retrieve FUJITSU PSWITCH configurations from the backup store
+description:
+  - Returns the configuration of each given host, as backed up by
+    M(fos_config) in the backup store, at a point in time.
+version_added: 2.10
+options:
+  _terms:
+    description: The names of the hosts in the backup store.
+    required: True
+  store_dir:
+    description: Path to the backup store.
+    type: path
+    required: True
+  date:
+    description:
+      - Point in time of the configuration, the most recent backup taken at
+        or before it is returned.  Either seconds since the epoch, or a local
+        date formatted as C(%Y-%m-%d@%H:%M:%S) or C(%Y-%m-%d %H:%M:%S).
+      - Defaults to the most recent backup.
+    type: str
+  versions:
+    description:
+      - Returns the list of the backups of each host, oldest first, instead
+        of a configuration.
+    type: bool
+    default: False
+"""
+
+EXAMPLES = """
+- name: show the configuration of sw1 at the beginning of October
+  debug:
+    msg: "{{ lookup('fujitsu.fos.fos_backup', 'sw1', store_dir='/var/backups/fos', date='2020-10-01 00:00:00') }}"
+
+- name: restore the configuration of the previous night
+  block:
+    - copy:
+        content: "{{ lookup('fujitsu.fos.fos_backup', inventory_hostname, store_dir='/var/backups/fos',
+                            date=lookup('pipe', 'date +%Y-%m-%d@00:00:00')) }}"
+        dest: "/tmp/{{ inventory_hostname }}.cfg"
+      delegate_to: localhost
+
+    - fos_config:
+        src: "/tmp/{{ inventory_hostname }}.cfg"
+"""
+
+RETURN = """
+_raw:
+  description:
+    - The configuration of each host, or with I(versions) the list of its
+      backups with their C(timestamp), C(date) and C(id).
+  type: list
+"""
+
+import time
+
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
+
+DATE_FORMATS = ('%Y-%m-%d@%H:%M:%S', '%Y-%m-%d %H:%M:%S')
+
+
+def parse_date(date):
+    try:
+        return float(date)
+    except ValueError:
+        pass
+
+    for date_format in DATE_FORMATS:
+        try:
+            return time.mktime(time.strptime(date, date_format))
+        except ValueError:
+            continue
+    raise AnsibleError('Invalid date %s, expected seconds since the epoch or %s' % (date, ' or '.join(DATE_FORMATS)))
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+
+        store = BackupStore(self.get_option('store_dir'))
+        timestamp = None
+        if self.get_option('date'):
+            timestamp = parse_date(self.get_option('date'))
+
+        ret = list()
+        for host in terms:
+            if self.get_option('versions'):
+                ret.append([dict(timestamp=ts, date=time.strftime(DATE_FORMATS[0], time.localtime(ts)), id=object_id)
+                            for ts, object_id in store.get_versions(host)])
+                continue
+
+            object_id = store.lookup(host, timestamp)
+            if object_id is None:
+                raise AnsibleError('No backup of %s found in %s' % (host, self.get_option('store_dir')))
+            ret.append(store.read(object_id))
+
+        return ret
@@ -30,26 +30,48 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import json
+import os
+import re
 
 from ansible.module_utils._text import to_text
+from ansible.module_utils.common._collections_compat import Mapping
 from ansible.module_utils.connection import Connection, ConnectionError
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.utils import to_list
-from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.config import NetworkConfig
+from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.config import NetworkConfig, dumps
 
 _DEVICE_CONFIGS = {}
 
+# Matches the "Key........ value" lines of show commands as well as the
+# "key      value" rows of their two column tables.
+FIELD_RE = re.compile(r'^(?:([^\r\n.]+?)\.{2,}|(\w+) {2,}) *([^\r\n]*?)[ \t]*$', re.M)
 
-def get_config(module, flags=None):
+# Confirmations asked by PSWITCH commands, with the answer that proceeds.
+# The wording differs between firmware versions.
+PROMPT_REGISTRY = (
+    (('copy system:running-config nvram:startup-config', 'write memory'),
+     re.compile(r'(?:Are you sure you want to save|save the configuration)[^\r\n]*', re.I), 'y'),
+    (('copy system:running-config nvram:startup-config', 'write memory'),
+     re.compile(r'overwrite[^\r\n]*\((?:y/n|yes/no)\)', re.I), 'y'),
+)
+
+# Any other question waiting for an answer, it is answered no so that the
+# command is cancelled at once instead of waiting for the command timeout.
+CONFIRM_PROMPT_RE = re.compile(r'[^\r\n]*(?:\((?:y/n|yes/no)\)|\[(?:y/n|yes/no|confirm)\])\s*$', re.I)
+CONFIRM_PROMPT_ANSWER = 'n'
+
+
+def get_config(module, flags=None, source='running'):
     flags = to_list(flags)
 
-    flag_str = ' '.join(flags)
+    flag_str = ' '.join([source] + flags)
 
     try:
         return _DEVICE_CONFIGS[flag_str]
     except KeyError:
         connection = get_connection(module)
         try:
-            out = connection.get_config(flags=flags)
+            out = connection.get_config(source=source, flags=flags)
         except ConnectionError as exc:
             module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
         cfg = to_text(out, errors='surrogate_then_replace').strip()
@@ -61,7 +83,20 @@ def run_commands(module, commands, check_rc=True):
     responses = list()
     connection = get_connection(module)
 
-    for cmd in to_list(commands):
+    commands = to_list(commands)
+    plain = [cmd['command'] if isinstance(cmd, dict) else cmd for cmd in commands
+             if not isinstance(cmd, dict) or not (cmd.get('prompt') or cmd.get('answer'))]
+    if len(commands) > 1 and len(plain) == len(commands):
+        # sent as one batch, so that the connection may spread it across shells
+        try:
+            out = connection.run_commands(commands=plain)
+            return [to_text(item, errors='surrogate_or_strict') for item in out]
+        except ConnectionError as exc:
+            module.fail_json(msg=to_text(exc))
+        except UnicodeError:
+            module.fail_json(msg=u'Failed to decode output from %s' % plain)
+
+    for cmd in commands:
         if isinstance(cmd, dict):
             command = cmd['command']
             prompt = cmd['prompt']
@@ -102,6 +137,46 @@ def get_defaults_flag(module):
     return to_text(out, errors='surrogate_then_replace').strip()
 
 
+def clear_command_cache(module):
+    connection = get_connection(module)
+    try:
+        connection.clear_command_cache()
+    except ConnectionError as exc:
+        module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
+
+
+def start_save(module):
+    connection = get_connection(module)
+    try:
+        return connection.start_save()
+    except ConnectionError as exc:
+        module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
+
+
+def get_save_status(module, token=None):
+    connection = get_connection(module)
+    try:
+        return connection.get_save_status(token)
+    except ConnectionError as exc:
+        module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
+
+
+def queue_config(module, **kwargs):
+    connection = get_connection(module)
+    try:
+        return connection.queue_config(**kwargs)
+    except ConnectionError as exc:
+        module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
+
+
+def flush_config(module, queue_ids=None):
+    connection = get_connection(module)
+    try:
+        return connection.flush_config(queue_ids=queue_ids)
+    except ConnectionError as exc:
+        module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
+
+
 def send_data(module, data):
     connection = Connection(module._socket_path)
     if (connection):
@@ -121,6 +196,18 @@ def load_config(module, commands):
         module.fail_json(msg=to_text(exc))
 
 
+def parse_fields(data):
+    """Returns all the key/value fields of a show command output
+
+    The output is scanned once, the first occurrence of a key wins.
+    """
+    fields = dict()
+    for match in FIELD_RE.finditer(data):
+        key = match.group(1) or match.group(2)
+        fields.setdefault(key.strip(), match.group(3))
+    return fields
+
+
 def is_parents(line):
     parents_set = [
         'interface',
@@ -176,3 +263,314 @@ def load_running_config(running):
         index += 1
 
     return running_obj
+
+
+def get_config_diff(candidate, running=None, diff_match='line', path=None, diff_replace='line'):
+    """Returns the commands of the candidate that the running config lacks
+
+    The configurations are compared as text, without a device connection,
+    so that saved configurations can be checked offline.  Either one may be
+    given already parsed, as a NetworkConfig, to be compared many times.
+    """
+    candidate_obj = candidate
+    if not isinstance(candidate, NetworkConfig):
+        candidate_obj = NetworkConfig(indent=4, contents=candidate)
+
+    if running and diff_match != 'none' and diff_replace != 'config':
+        running_obj = running
+        if not isinstance(running, NetworkConfig):
+            running_obj = load_running_config(running=running)
+        configdiffobjs = candidate_obj.difference(running_obj, path=path, match=diff_match, replace=diff_replace)
+    else:
+        configdiffobjs = candidate_obj.items
+
+    return dumps(configdiffobjs, 'commands') if configdiffobjs else ''
+
+
+# Commands that hold a single value in their mode, a new value replaces the
+# line of the previous one instead of adding a line.
+SINGLE_VALUE_COMMANDS = (
+    'hostname',
+    'clock timezone',
+    'network mgmt_vlan',
+    'serviceport ip',
+    'serviceport protocol',
+    'spanning-tree mode',
+    'description',
+    'mtu',
+    'speed',
+    'switchport mode',
+    'switchport access vlan',
+)
+
+
+# Commands without a value, a line of their own that no other command
+# overrides.  Any other command may replace a line it is not known to, e.g.
+# ip default-gateway, and can not be applied to the configuration text.
+FLAG_COMMANDS = (
+    'ip routing',
+    'lldp transmit',
+    'lldp receive',
+    'lldp notification',
+    'lldp transmit-mgmt',
+    'shutdown',
+)
+
+
+def get_command_key(line):
+    """Returns the keyword of a single valued command, None for other commands"""
+    for key in SINGLE_VALUE_COMMANDS:
+        if line == key or line.startswith(key + ' '):
+            return key
+    return None
+
+
+def get_sections(lines):
+    """Returns the (start, end) indexes of the sections of a running config
+
+    start is the index of the section line and end the one of its exit, or
+    of the blank line that ends it.
+    """
+    sections = dict()
+    index = 0
+    while index < len(lines):
+        if is_parents(lines[index]):
+            start = index
+            index += 1
+            while index < len(lines) and lines[index] not in ('exit', ''):
+                index += 1
+            sections.setdefault(lines[start], (start, index))
+        index += 1
+    return sections
+
+
+def apply_commands(lines, commands):
+    """Applies configuration commands to the lines of a running config
+
+    Returns the patched lines, or None as soon as the effect of a command on
+    the configuration text can not be told for sure, e.g. a keyword that is
+    not in the configuration, which may be abbreviated, the removal of a
+    line that is not there, or a new line that is neither a single valued
+    command nor a flag, which may override a line it is not known to.
+    """
+    lines = list(lines)
+    keywords = set(line.split()[0] for line in lines if line.strip())
+    section = None
+
+    for command in to_list(commands):
+        command = command.strip()
+        if not command or command.startswith('!'):
+            continue
+        if command == 'end':
+            break
+        if command == 'exit':
+            if section is None:
+                return None
+            section = None
+            continue
+
+        sections = get_sections(lines)
+        negate = command.startswith('no ')
+        target = command[3:].strip() if negate else command
+
+        if section is None and is_parents(target):
+            if negate:
+                if target in sections:
+                    start, end = sections[target]
+                    del lines[start:end + 1]
+            else:
+                if target not in sections:
+                    position = max([end + 1 for start, end in sections.values()] or [len(lines)])
+                    lines[position:position] = ['', target, 'exit']
+                section = target
+            continue
+
+        if target.split()[0] not in keywords:
+            return None
+
+        if section is None:
+            inner = set()
+            for start, end in sections.values():
+                inner.update(range(start, end + 1))
+            scope = [i for i in range(len(lines)) if i not in inner]
+            position = 0
+            for i in scope:
+                if lines[i] and lines[i] != 'exit' and not lines[i].startswith('!'):
+                    position = i + 1
+        else:
+            start, end = sections[section]
+            scope = list(range(start + 1, end))
+            position = end
+
+        if any(lines[i] == command for i in scope):
+            continue
+
+        key = get_command_key(target)
+        matches = [i for i in scope if lines[i] in (target, 'no ' + target) or (key and get_command_key(lines[i]) == key)]
+        if len(matches) > 1:
+            return None
+
+        if negate:
+            if not matches:
+                return None
+            del lines[matches[0]]
+        elif matches:
+            lines[matches[0]] = command
+        elif key or target in FLAG_COMMANDS:
+            lines.insert(position, command)
+        else:
+            return None
+
+    return lines
+
+
+def compact_commands(commands):
+    """Drops the commands of a candidate that do not change the outcome
+
+    Within a block of commands, the top level commands between two sections
+    or the commands of one section, a command is dropped when a later one
+    repeats it, sets the same single valued command again, or is its no
+    form, or the other way around.  Commands with prompts end a block.
+    """
+    compacted = list()
+    block = dict()
+    for command in to_list(commands):
+        if isinstance(command, Mapping):
+            compacted.append(command)
+            block = dict()
+            continue
+
+        line = command.strip()
+        if not line or line.startswith('!'):
+            compacted.append(command)
+            continue
+        if line in ('exit', 'end') or is_parents(line):
+            compacted.append(command)
+            block = dict()
+            continue
+
+        target = line[3:].strip() if line.startswith('no ') else line
+        key = get_command_key(target) or target
+        if key in block:
+            compacted[block[key]] = None
+        block[key] = len(compacted)
+        compacted.append(command)
+
+    return [command for command in compacted if command is not None]
+
+
+def get_indent(line):
+    return len(line) - len(line.lstrip())
+
+
+def get_parents(commands, index, modes=None):
+    """Returns the lines entering the mode the command at index is pushed in
+
+    A mode is entered by a section line of is_parents, a line of modes, or a
+    line the next line is indented under, and is left with exit.  Raises
+    ValueError when the command may be in a mode that none of them tell, as
+    when an exit after it leaves a mode that no line was seen entering.
+    """
+    lines = [command['command'] if isinstance(command, Mapping) else command for command in commands]
+    lines = [(position, line) for position, line in enumerate(lines)
+             if line.strip() and not line.strip().startswith('!') and line.strip() != 'end']
+    modes = [mode.strip() for mode in modes or ()]
+
+    # the open modes, as (indent, line, entered by indentation)
+    stack = list()
+    parents = None
+    for number, (position, raw) in enumerate(lines):
+        line = raw.strip()
+        if parents is None and position >= index:
+            parents = [entry[1] for entry in stack]
+
+        if line == 'exit':
+            if stack:
+                stack.pop()
+                if parents is not None and not stack:
+                    # back in Global Config mode from the mode of index
+                    break
+            elif parents is not None:
+                raise ValueError('the mode of line %d of the commands is not known' % (index + 1))
+            continue
+
+        indent = get_indent(raw)
+        while stack and stack[-1][0] >= indent and (stack[-1][2] or is_parents(line)):
+            # dedented out of the mode, or a new section in place of the last one
+            stack.pop()
+
+        indented = number + 1 < len(lines) and get_indent(lines[number + 1][1]) > indent
+        if indented or is_parents(line) or line in modes:
+            stack.append((indent, line, indented))
+
+    if parents is None:
+        parents = [entry[1] for entry in stack]
+    return parents
+
+
+def read_checkpoint(path):
+    """Returns the digest and the count of acknowledged lines of a push"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_checkpoint(path, digest, index):
+    tmp_path = '%s.tmp' % path
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(digest=digest, index=index), f)
+    os.rename(tmp_path, path)
+
+
+def get_prompts(command, prompt=None, answer=None):
+    """Returns the prompts to expect for a command and their answers
+
+    The prompts given by the caller come first, then the ones registered
+    for the command and last any other confirmation.
+    """
+    prompts = to_list(prompt)
+    answers = to_list(answer)
+    answers.extend([answers[0] if answers else ''] * (len(prompts) - len(answers)))
+    answers = answers[:len(prompts)]
+
+    for commands, regex, reply in PROMPT_REGISTRY:
+        if command.strip().startswith(commands):
+            prompts.append(regex.pattern)
+            answers.append(reply)
+
+    prompts.append(CONFIRM_PROMPT_RE.pattern)
+    answers.append(CONFIRM_PROMPT_ANSWER)
+    return prompts, answers
+
+
+def get_unknown_prompt(output, prompts):
+    """Returns the confirmation of the output none of the prompts expected
+
+    Every line ending with a question, answered or not, is checked, so that
+    a command cancelled by the answer fails even when the device prints more
+    after it, while lines quoting a confirmation amid other text do not.
+    """
+    for line in output.splitlines():
+        line = line.strip()
+        question = line
+        # the answer is echoed after the question
+        if question.lower().endswith(' ' + CONFIRM_PROMPT_ANSWER):
+            question = question[:-len(CONFIRM_PROMPT_ANSWER)]
+        if not CONFIRM_PROMPT_RE.search(question):
+            continue
+        if not any(re.search(prompt, line, re.I) for prompt in prompts):
+            return line
+    return None
+    lines = output.strip().splitlines()
+    if not lines:
+        return None
+    # the answer is echoed after the question
+    last = lines[-1].strip()
+    if last.lower().endswith(' ' + CONFIRM_PROMPT_ANSWER):
+        last = last[:-len(CONFIRM_PROMPT_ANSWER)]
+    match = CONFIRM_PROMPT_RE.search(last)
+    if match:
+        return lines[-1].strip()
+    return None
@@ -0,0 +1,190 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import bisect
+import difflib
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from ansible.module_utils._text import to_bytes, to_text
+
+
+class BackupStore(object):
+    """Content addressed store of configuration snapshots
+
+    Each distinct configuration is stored once, under the sha1 of its text,
+    as a gzip compressed object.  The snapshots of a host are stored as line
+    deltas against its previous snapshot, with a full copy every
+    ``max_chain`` versions to bound the cost of a restore.  A per-host index
+    of (timestamp, object id) pairs, sorted by time, gives point in time
+    retrieval.
+
+    Layout of the store directory::
+
+        objects/<id[:2]>/<id>.gz    {"base": id, "depth": n, "ops": [...]}
+                                    or {"base": null, "depth": 0, "lines": [...]}
+        index/<host>.json           [[timestamp, id], ...]
+    """
+
+    def __init__(self, path, max_chain=50):
+        self.path = path
+        self.max_chain = max_chain
+
+    def _object_path(self, object_id):
+        return os.path.join(self.path, 'objects', object_id[:2], '%s.gz' % object_id)
+
+    def _index_path(self, host):
+        return os.path.join(self.path, 'index', '%s.json' % host)
+
+    def _write(self, path, data, compress=False):
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        data = to_bytes(json.dumps(data), errors='surrogate_or_strict')
+        f = gzip.open(tmp_path, 'wb') if compress else open(tmp_path, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.rename(tmp_path, path)
+
+    def _load_object(self, object_id):
+        f = gzip.open(self._object_path(object_id), 'rb')
+        try:
+            return json.loads(to_text(f.read(), errors='surrogate_or_strict'))
+        finally:
+            f.close()
+
+    def _read_lines(self, object_id):
+        chain = list()
+        obj = self._load_object(object_id)
+        while obj['base'] is not None:
+            chain.append(obj['ops'])
+            obj = self._load_object(obj['base'])
+
+        lines = obj['lines']
+        for ops in reversed(chain):
+            lines = apply_delta(lines, ops)
+        return lines
+
+    def get_versions(self, host):
+        """Returns the (timestamp, object id) pairs of a host, oldest first"""
+        try:
+            with open(self._index_path(host)) as f:
+                return [tuple(item) for item in json.load(f)]
+        except (IOError, OSError, ValueError):
+            return list()
+
+    def get_hosts(self):
+        """Returns the names of the hosts in the store"""
+        try:
+            names = os.listdir(os.path.join(self.path, 'index'))
+        except OSError:
+            return list()
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def lookup(self, host, timestamp=None):
+        """Returns the object id of the snapshot of a host at a point in time"""
+        versions = self.get_versions(host)
+        if timestamp is not None:
+            versions = versions[:bisect.bisect_right([item[0] for item in versions], timestamp)]
+        if versions:
+            return versions[-1][1]
+
+    def read(self, object_id):
+        """Returns the configuration text of an object"""
+        return '\n'.join(self._read_lines(object_id))
+
+    def put(self, host, contents, timestamp=None):
+        """Stores a snapshot of a host and returns its object id
+
+        Nothing is written when the snapshot is identical to the previous
+        one of the host, and no object is written when the configuration is
+        already in the store.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        object_id = hashlib.sha1(to_bytes(contents, errors='surrogate_or_strict')).hexdigest()
+        versions = self.get_versions(host)
+        if versions and versions[-1][1] == object_id:
+            return object_id
+
+        if not os.path.exists(self._object_path(object_id)):
+            lines = contents.split('\n')
+            obj = dict(base=None, depth=0, lines=lines)
+            if versions:
+                base_id = versions[-1][1]
+                depth = self._load_object(base_id)['depth'] + 1
+                if depth < self.max_chain:
+                    ops = get_delta(self._read_lines(base_id), lines)
+                    obj = dict(base=base_id, depth=depth, ops=ops)
+            self._write(self._object_path(object_id), obj, compress=True)
+
+        versions.append((timestamp, object_id))
+        versions.sort()
+        self._write(self._index_path(host), versions)
+        return object_id
+
+
+def get_delta(base, lines):
+    """Returns the operations that turn the base lines into the given lines
+
+    Each operation either copies a range of the base lines, ``[start, end]``,
+    or inserts literal lines, ``{"insert": ["line", ...]}``.
+    """
+    ops = list()
+    matcher = difflib.SequenceMatcher(None, base, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append({'insert': lines[j1:j2]})
+    return ops
+
+
+def apply_delta(base, ops):
+    lines = list()
+    for op in ops:
+        if isinstance(op, dict):
+            lines.extend(op['insert'])
+        else:
+            lines.extend(base[op[0]:op[1]])
+    return lines
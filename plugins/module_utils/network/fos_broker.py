@@ -0,0 +1,417 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Local broker keeping authenticated FUJITSU PSWITCH shells open across runs
+
+The broker is a daemon on the control node listening on a Unix socket.  The
+fos cliconf plugin, when given the socket with ansible_fos_broker_socket,
+leases a shell from it instead of opening its own SSH session, so that the
+handshake, the login, enable and the terminal setup are paid once per
+switch and not once per playbook run.  Start it with:
+
+    python -m ansible_collections.fujitsu.fos.scripts.fos_broker \\
+        --socket ~/.ansible/fos_broker.sock
+
+This module only holds the broker and its client, the daemon is started by
+the script, which runs on the control node.
+
+Each client connection holds at most one session, leased until the client
+disconnects.  Sessions idle for longer than the idle timeout are closed and
+at most max sessions are kept open, the least recently used idle one is
+closed to make room for a new one.
+
+The protocol is one JSON object per line in each direction.  A request
+names its method, a response has either a result or an error.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.module_utils.six.moves import socketserver
+
+try:
+    import paramiko
+    HAS_PARAMIKO = True
+except ImportError:
+    HAS_PARAMIKO = False
+
+PASSWORD_PROMPT = br"[\r\n](?:Local_)?[Pp]assword: ?$"
+RECV_SIZE = 4096
+
+# the prompts and errors of the fos terminal plugin, which module_utils can not import
+STDOUT_RE = [
+    re.compile(br"[\r\n]?[\w\+\-\.:\/\[\]]+(?:\([^\)]+\)){0,3}(?:[>#]) ?$"),
+    re.compile(br"[\r\n]?(?:\([^\)]+\) ){,3}(?:>|#)$"),
+]
+
+STDERR_RE = [
+    re.compile(br"% ?Error"),
+    re.compile(br"% ?Bad secret"),
+    re.compile(br"invalid input", re.I),
+    re.compile(br"(?:incomplete|ambiguous) command", re.I),
+    re.compile(br"connection timed out", re.I),
+    re.compile(br"[^\r\n]+ not found"),
+    re.compile(br"'[^']' +returned error code: ?\d+"),
+]
+
+
+class BrokerError(Exception):
+    pass
+
+
+def get_session_key(request):
+    """Sessions are shared only by clients giving the same credentials"""
+    secret = '%s\0%s' % (request.get('password') or '', request.get('private_key_file') or '')
+    return (request['host'], int(request.get('port') or 22), request.get('username') or '',
+            hashlib.sha256(to_bytes(secret, errors='surrogate_or_strict')).hexdigest())
+
+
+def open_shell(request):
+    """Opens an SSH shell on the device, returns the client and the channel"""
+    if not HAS_PARAMIKO:
+        raise BrokerError('paramiko is required by the broker')
+
+    client = paramiko.SSHClient()
+    client.load_system_host_keys()
+    if request.get('host_key_checking', True) and not request.get('host_key_auto_add'):
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())
+    else:
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+    try:
+        client.connect(request['host'], port=int(request.get('port') or 22),
+                       username=request.get('username'), password=request.get('password'),
+                       key_filename=request.get('private_key_file'),
+                       look_for_keys=not request.get('password'),
+                       timeout=request.get('timeout') or 30)
+        shell = client.invoke_shell()
+    except (paramiko.SSHException, socket.error) as exc:
+        client.close()
+        raise BrokerError('unable to open a session on %s: %s' % (request['host'], to_text(exc)))
+    return client, shell
+
+
+class Session(object):
+    """An authenticated shell on a device"""
+
+    def __init__(self, key):
+        self.key = key
+        self.client = None
+        self.shell = None
+        self.prompt = None
+        self.device_info = None
+        self.leased = True
+        self.last_used = time.time()
+
+    def is_alive(self):
+        return self.shell is not None and not self.shell.closed
+
+    def open(self, connect, request):
+        timeout = request.get('timeout') or 30
+        self.client, self.shell = connect(request)
+        self.receive(timeout=timeout)
+        self.send('terminal length 0', timeout=timeout)
+        self.authorize(request)
+
+    def authorize(self, request):
+        """Enters the privileged mode, as the terminal plugin does on become"""
+        if not request.get('become') or self.prompt.endswith('#'):
+            return
+
+        prompts = answers = ()
+        if request.get('become_pass'):
+            prompts, answers = (PASSWORD_PROMPT,), (request['become_pass'],)
+        self.send('enable', prompts, answers, timeout=request.get('timeout') or 30)
+        if not self.prompt.endswith('#'):
+            raise BrokerError('failed to elevate privilege to enable mode still at prompt [%s]' % self.prompt)
+
+    def send(self, command, prompts=(), answers=(), sendonly=False, newline=True, timeout=30):
+        data = to_bytes(command, errors='surrogate_or_strict')
+        self.shell.sendall(data + b'\r' if newline else data)
+        if sendonly:
+            return ''
+        return self.receive(command, prompts, answers, timeout)
+
+    def receive(self, command=None, prompts=(), answers=(), timeout=30):
+        """Reads until the device returns to its prompt, answering the given prompts"""
+        prompts = [re.compile(to_bytes(p, errors='surrogate_or_strict'), re.I) for p in prompts]
+        answered = set()
+        deadline = time.time() + timeout
+        buf = b''
+        while True:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    raise socket.timeout()
+                self.shell.settimeout(remaining)
+                data = self.shell.recv(RECV_SIZE)
+            except socket.timeout:
+                self.close()
+                raise BrokerError('timeout value %s seconds reached while waiting for the prompt' % timeout)
+            if not data:
+                self.close()
+                raise BrokerError('session closed by the device')
+            buf += data
+
+            tail = buf[-1024:]
+            for index, regex in enumerate(prompts):
+                if index not in answered and regex.search(tail):
+                    answered.add(index)
+                    self.shell.sendall(to_bytes(answers[min(index, len(answers) - 1)], errors='surrogate_or_strict') + b'\r')
+                    break
+            else:
+                for regex in STDOUT_RE:
+                    if regex.search(tail):
+                        return self.get_output(buf, command)
+
+    def get_output(self, buf, command):
+        response, dummy, prompt = buf.rpartition(b'\n')
+        self.prompt = to_text(prompt, errors='surrogate_then_replace').strip()
+        for regex in STDERR_RE:
+            if regex.search(response):
+                raise BrokerError(to_text(response, errors='surrogate_then_replace').strip())
+
+        lines = to_text(response, errors='surrogate_then_replace').replace('\r', '').split('\n')
+        if command and lines and command.strip() in lines[0]:
+            lines = lines[1:]
+        return '\n'.join(lines).strip()
+
+    def close(self):
+        if self.shell is not None:
+            self.shell.close()
+        if self.client is not None:
+            self.client.close()
+
+
+class Broker(object):
+    """Pool of the sessions leased to the clients"""
+
+    def __init__(self, max_sessions=64, idle_timeout=900, connect=open_shell):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.connect = connect
+        self.sessions = list()
+        self.lock = threading.Lock()
+
+    def lease(self, request):
+        """Returns an idle session opened with the same credentials, or a new one"""
+        key = get_session_key(request)
+        closing = list()
+        with self.lock:
+            for session in [s for s in self.sessions if not s.leased and not s.is_alive()]:
+                self.sessions.remove(session)
+
+            for session in self.sessions:
+                if session.key == key and not session.leased:
+                    session.leased = True
+                    break
+            else:
+                session = None
+                if len(self.sessions) >= self.max_sessions:
+                    idle = [s for s in self.sessions if not s.leased]
+                    if not idle:
+                        raise BrokerError('all the %d sessions of the broker are in use' % self.max_sessions)
+                    closing.append(min(idle, key=lambda s: s.last_used))
+                    self.sessions.remove(closing[-1])
+                new = Session(key)
+                self.sessions.append(new)
+
+        for idle in closing:
+            idle.close()
+
+        if session is not None:
+            try:
+                # the prompt is refreshed and a session dropped by the device detected
+                session.send('', timeout=request.get('timeout') or 30)
+                session.authorize(request)
+                return session, True
+            except BrokerError:
+                session.close()
+                self.release(session)
+                return self.lease(request)
+
+        try:
+            new.open(self.connect, request)
+        except Exception as exc:
+            new.close()
+            with self.lock:
+                self.sessions.remove(new)
+            if isinstance(exc, BrokerError):
+                raise
+            raise BrokerError('unable to open a session on %s: %s' % (request['host'], to_text(exc)))
+        return new, False
+
+    def release(self, session):
+        if session.is_alive() and session.prompt and session.prompt.endswith(')#'):
+            # leaves the configuration modes for the next client
+            try:
+                session.send('end')
+            except BrokerError:
+                pass
+
+        with self.lock:
+            session.leased = False
+            session.last_used = time.time()
+            if not session.is_alive() and session in self.sessions:
+                self.sessions.remove(session)
+
+    def evict(self, now=None):
+        """Closes the sessions idle for longer than the idle timeout"""
+        now = now or time.time()
+        with self.lock:
+            expired = [s for s in self.sessions if not s.leased and s.last_used + self.idle_timeout < now]
+            for session in expired:
+                self.sessions.remove(session)
+        for session in expired:
+            session.close()
+
+    def close(self):
+        with self.lock:
+            sessions, self.sessions = self.sessions, list()
+        for session in sessions:
+            session.close()
+
+    def handle(self, request, state):
+        """Runs a request of a client, state holds the session leased to it"""
+        method = request.get('method')
+        if method == 'open':
+            if state.get('session') is not None:
+                self.release(state.pop('session'))
+            session, reused = self.lease(request)
+            state['session'] = session
+            return dict(reused=reused, prompt=session.prompt, device_info=session.device_info)
+
+        if method == 'status':
+            with self.lock:
+                return [dict(host=s.key[0], port=s.key[1], username=s.key[2], leased=s.leased,
+                             idle=round(time.time() - s.last_used, 3)) for s in self.sessions]
+
+        session = state.get('session')
+        if session is None:
+            raise BrokerError('no session is open, %s requires open first' % method)
+        if not session.is_alive():
+            raise BrokerError('session closed by the device')
+
+        timeout = request.get('timeout') or 30
+        if method == 'send':
+            output = session.send(request['command'], request.get('prompt') or (), request.get('answer') or (),
+                                  request.get('sendonly', False), request.get('newline', True), timeout)
+            return dict(output=output, prompt=session.prompt)
+        if method == 'receive':
+            return dict(output=session.receive(timeout=timeout), prompt=session.prompt)
+        if method == 'set_device_info':
+            session.device_info = request['device_info']
+            return dict()
+        raise BrokerError('unknown method %s' % method)
+
+
+class BrokerHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        state = dict()
+        try:
+            for line in iter(self.rfile.readline, b''):
+                try:
+                    result = self.server.broker.handle(json.loads(to_text(line, errors='surrogate_or_strict')), state)
+                    response = dict(result=result)
+                except BrokerError as exc:
+                    response = dict(error=to_text(exc))
+                except (ValueError, KeyError, TypeError) as exc:
+                    response = dict(error='invalid request: %s' % to_text(exc))
+                self.wfile.write(to_bytes(json.dumps(response)) + b'\n')
+                self.wfile.flush()
+        finally:
+            if state.get('session') is not None:
+                self.server.broker.release(state.pop('session'))
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path, broker):
+        socketserver.UnixStreamServer.__init__(self, path, BrokerHandler)
+        self.broker = broker
+
+    def serve(self):
+        """Serves the clients, evicting the idle sessions in the background"""
+        def evict():
+            while True:
+                time.sleep(min(self.broker.idle_timeout, 60))
+                self.broker.evict()
+
+        thread = threading.Thread(target=evict)
+        thread.daemon = True
+        thread.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.broker.close()
+
+
+class BrokerClient(object):
+    """Connection of the cliconf plugin to the broker"""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(os.path.expanduser(path))
+        except socket.error as exc:
+            self.sock.close()
+            raise BrokerError('unable to connect to the broker at %s: %s' % (path, to_text(exc)))
+        self.rfile = self.sock.makefile('rb')
+
+    def call(self, method, **params):
+        params['method'] = method
+        # the broker waits for the device for at most the timeout
+        self.sock.settimeout((params.get('timeout') or 30) + 10)
+        try:
+            self.sock.sendall(to_bytes(json.dumps(params)) + b'\n')
+            line = self.rfile.readline()
+        except socket.error as exc:
+            raise BrokerError('lost the connection to the broker: %s' % to_text(exc))
+        if not line:
+            raise BrokerError('lost the connection to the broker')
+
+        response = json.loads(to_text(line, errors='surrogate_or_strict'))
+        if 'error' in response:
+            raise BrokerError(response['error'])
+        return response['result']
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
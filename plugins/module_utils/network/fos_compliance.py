@@ -0,0 +1,241 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Checks saved FUJITSU PSWITCH configurations against golden snippets
+
+The rules are snippets that each configuration must contain, given as
+fos_config would take them.  A rule passes when fos_config would push
+nothing.  Each configuration is parsed once and all the rules are
+evaluated against it, the configurations are spread across a pool of
+processes.  The rules file is a list of rules with a name, lines and
+optional parents, match and replace.  The checker is run on the control
+node by scripts/fos_compliance.py.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import multiprocessing
+import os
+
+from collections import OrderedDict
+
+from ansible.module_utils._text import to_text
+from ansible.module_utils.common._collections_compat import Mapping
+from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.config import NetworkConfig, dumps
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_config_diff, load_running_config
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
+
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+
+class LineIndex(list):
+    """Lines of a parsed configuration, looked up by their text and parents
+
+    NetworkConfig.difference looks each line of the candidate up in the
+    running config, comparing the text of all its lines every time.
+    """
+
+    def __init__(self, items):
+        super(LineIndex, self).__init__(items)
+        self.lines = set(item.line for item in items)
+
+    def __contains__(self, item):
+        return item.line in self.lines
+
+
+class IndexedConfig(NetworkConfig):
+    """A parsed configuration whose lines are a LineIndex"""
+
+    def __init__(self, config):
+        super(IndexedConfig, self).__init__(indent=4)
+        self._index = LineIndex(config.items)
+
+    @property
+    def items(self):
+        return self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def load_config_index(config):
+    """Parses a configuration once for all the rules"""
+    return IndexedConfig(load_running_config(config))
+
+
+class Rule(object):
+    """A snippet that a configuration must contain"""
+
+    KEYS = ('name', 'lines', 'parents', 'match', 'replace')
+
+    def __init__(self, name, lines=None, parents=None, match='line', replace='line'):
+        if not lines:
+            raise ValueError('rule %s has no lines' % name)
+        if match not in ('line', 'strict', 'exact'):
+            raise ValueError('rule %s: invalid match %s' % (name, match))
+
+        self.name = name
+        self.parents = parents or None
+        self.match = match
+        self.replace = replace
+        candidate = NetworkConfig(indent=4)
+        candidate.add(lines if isinstance(lines, list) else [lines], parents=parents or [])
+        self.candidate = dumps(candidate, 'raw')
+        # parsed in the worker processes, once each
+        self._candidate_obj = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_candidate_obj'] = None
+        return state
+
+    def check(self, running_obj):
+        """Returns the commands of the rule missing from a parsed configuration"""
+        if self._candidate_obj is None:
+            self._candidate_obj = NetworkConfig(indent=4, contents=self.candidate)
+        diff = get_config_diff(self._candidate_obj, running_obj, self.match, self.parents, self.replace)
+        return diff.split('\n') if diff else []
+
+
+def load_rules(path):
+    """Reads the rules from a YAML or JSON file, JSON only without PyYAML"""
+    with open(path) as f:
+        if HAS_YAML:
+            items = yaml.safe_load(f)
+        else:
+            try:
+                items = json.load(f)
+            except ValueError:
+                raise ValueError('PyYAML is required to read %s, or give the rules as JSON' % path)
+    if not isinstance(items, list):
+        raise ValueError('%s must hold a list of rules' % path)
+
+    rules = list()
+    for item in items:
+        if not isinstance(item, Mapping) or not item.get('name'):
+            raise ValueError('each rule of %s needs a name' % path)
+        unknown = sorted(key for key in item if key not in Rule.KEYS)
+        if unknown:
+            raise ValueError('rule %s of %s: unsupported keys %s, expected %s'
+                             % (item['name'], path, ', '.join(unknown), ', '.join(Rule.KEYS)))
+        rules.append(Rule(**item))
+    return rules
+
+
+def check_config(config, rules):
+    """Returns the missing commands of each rule, by rule name, for a configuration"""
+    running_obj = load_config_index(config)
+    return OrderedDict((rule.name, rule.check(running_obj)) for rule in rules)
+
+
+def get_sources(config_dir=None, store_dir=None):
+    """Returns the configurations to check as (host, kind, location) tuples
+
+    The files of config_dir are named after their host, with any extension,
+    and the latest backup of each host of the store in store_dir is used.
+    """
+    sources = list()
+    if config_dir:
+        for name in sorted(os.listdir(config_dir)):
+            path = os.path.join(config_dir, name)
+            if os.path.isfile(path):
+                sources.append((os.path.splitext(name)[0], 'file', path))
+
+    if store_dir:
+        store = BackupStore(store_dir)
+        for host in store.get_hosts():
+            object_id = store.lookup(host)
+            if object_id:
+                sources.append((host, 'store', (store_dir, object_id)))
+    return sources
+
+
+def read_source(kind, location):
+    if kind == 'store':
+        return BackupStore(location[0]).read(location[1])
+    with open(location) as f:
+        return f.read()
+
+
+_RULES = None
+
+
+def _init_worker(rules):
+    global _RULES
+    _RULES = rules
+
+
+def _check_source(source):
+    host, kind, location = source
+    try:
+        config = read_source(kind, location)
+    except (IOError, OSError, ValueError) as exc:
+        return host, None, to_text(exc)
+    return host, check_config(config, _RULES), None
+
+
+def check_fleet(sources, rules, processes=None):
+    """Evaluates all the rules against each configuration on a process pool
+
+    Each configuration is read and parsed by the worker it is handed to,
+    once, so only the sources and the results cross the processes.
+    processes defaults to the number of cores.
+
+    Returns the missing commands of each rule by host and rule name, and
+    the errors reading the configurations by host.
+    """
+    if processes == 1 or len(sources) < 2:
+        _init_worker(rules)
+        results = [_check_source(source) for source in sources]
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (rules,))
+        try:
+            chunksize = max(1, len(sources) // ((processes or multiprocessing.cpu_count()) * 4))
+            results = pool.map(_check_source, sources, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
+    matrix = OrderedDict()
+    errors = OrderedDict()
+    for host, missing, error in results:
+        if error is not None:
+            errors[host] = error
+        else:
+            matrix[host] = missing
+    return matrix, errors
+
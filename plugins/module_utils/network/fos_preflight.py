@@ -0,0 +1,202 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This code is part of Ansible, but is an independent component.
+# This particular file snippet, and this file snippet only, is BSD licensed.
+# Modules you write using this snippet, which is embedded dynamically by Ansible
+# still belong to the author of the module, and may assign their own license
+# to the complete work.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright notice,
+#      this list of conditions and the following disclaimer in the documentation
+#      and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE
+# USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import errno
+import os
+import select
+import socket
+import threading
+import time
+
+from ansible.module_utils._text import to_text
+
+SSH_BANNER = b'SSH-'
+
+# how often the probes resolving their host name are looked at
+RESOLVE_POLL = 0.05
+
+
+def is_address(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except (socket.error, ValueError):
+            pass
+    return False
+
+
+class Probe(object):
+    """Non-blocking check of the SSH server of one host"""
+
+    def __init__(self, name, host, port, timeout, banner):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.banner = banner
+        self.sock = None
+        self.resolver = None
+        self.addrinfo = None
+        self.error = None
+        self.buffer = b''
+        self.connected = False
+        self.started = time.time()
+        self.deadline = self.started + timeout
+        self.result = None
+
+    def start(self):
+        """Connects, once the host name is resolved in a thread of its own
+
+        getaddrinfo blocks and can not be given a timeout, a probe whose host
+        name is not resolved by its deadline times out and its thread is left
+        to finish on its own.
+        """
+        if is_address(self.host):
+            self.resolve()
+            return self.connect()
+        self.resolver = threading.Thread(target=self.resolve)
+        self.resolver.daemon = True
+        self.resolver.start()
+
+    @property
+    def resolving(self):
+        return self.resolver is not None and self.resolver.is_alive()
+
+    def resolve(self):
+        try:
+            self.addrinfo = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0]
+        except (socket.error, socket.gaierror) as exc:
+            self.error = to_text(exc)
+
+    def connect(self):
+        if self.error is not None:
+            return self.finish(False, self.error)
+        try:
+            family, socktype, proto, dummy, address = self.addrinfo
+            self.sock = socket.socket(family, socktype, proto)
+            self.sock.setblocking(0)
+            code = self.sock.connect_ex(address)
+        except (socket.error, socket.gaierror) as exc:
+            return self.finish(False, to_text(exc))
+
+        if code not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            return self.finish(False, os.strerror(code))
+        if code == 0:
+            self.on_connect()
+
+    def on_connect(self):
+        code = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if code:
+            return self.finish(False, os.strerror(code))
+        self.connected = True
+        if not self.banner:
+            self.finish(True)
+
+    def on_read(self):
+        try:
+            data = self.sock.recv(256)
+        except socket.error as exc:
+            return self.finish(False, to_text(exc))
+        if not data:
+            return self.finish(False, 'connection closed before the SSH banner')
+
+        self.buffer += data
+        if SSH_BANNER in self.buffer:
+            self.finish(True)
+        elif len(self.buffer) > 4096:
+            self.finish(False, 'no SSH banner received')
+
+    def on_timeout(self):
+        if self.sock is None:
+            self.finish(False, 'timed out resolving %s' % self.host)
+        elif self.connected:
+            self.finish(False, 'timed out waiting for the SSH banner')
+        else:
+            self.finish(False, 'timed out connecting to %s:%s' % (self.host, self.port))
+
+    def finish(self, reachable, msg=None):
+        if self.sock is not None:
+            self.sock.close()
+        self.result = dict(reachable=reachable, host=self.host, port=self.port,
+                           elapsed=round(time.time() - self.started, 3))
+        if msg:
+            self.result['msg'] = msg
+
+
+def probe_hosts(targets, timeout=3, banner=True, concurrency=256):
+    """Checks that the SSH server of each target answers
+
+    The targets, (name, host, port) tuples, are probed concurrently with
+    non-blocking sockets.  Each probe is given timeout seconds to resolve
+    the host name, to connect and, with banner, to receive the SSH
+    identification string.  At most concurrency probes are in flight at
+    once.
+
+    Returns a dict of the results by name.
+    """
+    queue = list(reversed(targets))
+    running = list()
+    results = dict()
+
+    while queue or running:
+        while queue and len(running) < concurrency:
+            name, host, port = queue.pop()
+            probe = Probe(name, host, port, timeout, banner)
+            probe.start()
+            if probe.result is None:
+                running.append(probe)
+            else:
+                results[name] = probe.result
+
+        if running:
+            writers = [p.sock for p in running if p.sock is not None and not p.connected]
+            readers = [p.sock for p in running if p.connected]
+            wait = max(min(p.deadline for p in running) - time.time(), 0)
+            if any(p.sock is None for p in running):
+                wait = min(wait, RESOLVE_POLL)
+            readable, writable, dummy = select.select(readers, writers, [], wait)
+
+            now = time.time()
+            for probe in running:
+                if probe.sock is None and not probe.resolving:
+                    probe.connect()
+                elif probe.sock is not None and probe.sock in writable:
+                    probe.on_connect()
+                elif probe.sock in readable:
+                    probe.on_read()
+                elif now >= probe.deadline:
+                    probe.on_timeout()
+
+            for probe in [p for p in running if p.result is not None]:
+                running.remove(probe)
+                results[probe.name] = probe.result
+
+    return results
@@ -67,8 +67,60 @@ options:
         of the command. If the command does not pass the specified
         conditions, the interval indicates how long to wait before
         trying the command again.
+      - Retries always bypass the read-only command cache of the
+        connection, see the C(ansible_fos_command_cache) variable.
     type: int
     default: 1
+  backoff:
+    description:
+      - Factor the I(interval) is multiplied by after each retry, so that
+        a value of C(2) doubles the wait between two retries.  The default
+        value keeps the interval fixed.
+    type: float
+    default: 1
+  jitter:
+    description:
+      - Randomizes each wait between half and all of its computed value,
+        to spread the retries of many devices over time.
+    type: bool
+    default: 'no'
+  timeout:
+    description:
+      - Overall deadline in seconds of the I(wait_for) loop.  No retry is
+        started once it has expired, even if I(retries) is not exhausted.
+    type: int
+  output_dir:
+    description:
+      - Path to a local directory where the output of each command is
+        written, instead of being returned in C(stdout) and C(stdout_lines).
+        Without I(wait_for), the commands are run one at a time and each
+        output is written as soon as it is received, so that large outputs
+        are never held together in memory.
+      - The files are named after the position and the text of the command,
+        so the directory should not be shared between devices.  It needs to
+        be created in advance.
+    type: path
+  compress:
+    description:
+      - Compresses the files written to I(output_dir) with gzip.
+    type: bool
+    default: 'no'
+  result_format:
+    description:
+      - Shape of the returned responses.  With C(full), both C(stdout) and
+        C(stdout_lines) are returned.  With C(stdout), C(stdout_lines) is
+        omitted.  With C(checksum), only the sha1 checksum of each response
+        is returned in C(stdout_checksum).
+      - Ignored when I(output_dir) is given.
+    type: str
+    default: full
+    choices: ['full', 'stdout', 'checksum']
+  filter:
+    description:
+      - Regular expression selecting the lines of each response that are
+        returned, the other lines are dropped.
+      - Ignored when I(output_dir) is given.
+    type: str
 """
 
 EXAMPLES = """
@@ -97,32 +149,109 @@ tasks:
         - result[0] contains Runtime Version
         - result[1] contains Fujitsu
 
+  - name: wait for a port to come up, polling less and less often
+    fos_command:
+      commands:
+        - show interfaces status 0/1
+      wait_for: result[0] contains Up
+      retries: 20
+      backoff: 2
+      jitter: yes
+      timeout: 300
+
+  - name: return only the lines of interest
+    fos_command:
+      commands:
+        - show version
+      result_format: stdout
+      filter: Runtime Version
+
+  - name: capture diagnostics to local files
+    fos_command:
+      commands:
+        - show tech-support
+      output_dir: "/var/tmp/diag/{{ inventory_hostname }}"
+      compress: yes
+
 """
 
 RETURN = """
 stdout:
-  description: The set of responses from the commands
-  returned: always apart from low level errors (such as action plugin)
+  description:
+    - The set of responses from the commands
+    - With I(wait_for), only the commands referenced by an unmet condition
+      are run again on retries, the other responses come from the last run
+      of their command.
+  returned: when result_format is not checksum and output_dir is not given
   type: list
   sample: ['...', '...']
 stdout_lines:
   description: The value of stdout split into a list
-  returned: always apart from low level errors (such as action plugin)
+  returned: when result_format is full and output_dir is not given
   type: list
   sample: [['...', '...'], ['...'], ['...']]
+stdout_checksum:
+  description: The sha1 checksum of each response
+  returned: when result_format is checksum and output_dir is not given
+  type: list
+  sample: ['0b3bc1f0a2ac8c0cd4f8e1b0e9a8a9eaa3e8dc4d']
+output_files:
+  description:
+    - The files the outputs were written to, with their size and the sha1
+      checksum of the uncompressed output
+  returned: when output_dir is given
+  type: list
+  sample: [{'command': 'show version', 'path': '/var/tmp/diag/sw1/00_show_version.txt',
+            'size': 612, 'checksum': '0b3bc1f0a2ac8c0cd4f8e1b0e9a8a9eaa3e8dc4d'}]
 failed_conditions:
   description: The list of conditionals that have failed
   returned: failed
   type: list
   sample: ['...', '...']
 """
+import gzip
+import hashlib
+import os
+import random
+import re
 import time
 
-from ansible.module_utils._text import to_text
+from ansible.module_utils._text import to_bytes, to_text
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.parsing import Conditional
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.utils import transform_commands, to_lines
-from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import run_commands
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import run_commands, clear_command_cache
+
+
+def get_pending(conditionals, count):
+    """Returns the indexes of the commands an unmet conditional refers to"""
+    pending = set()
+    for item in conditionals:
+        match = re.match(r'result\[(\d+)\]', item.key)
+        if not match:
+            return list(range(count))
+        pending.add(int(match.group(1)))
+    return sorted(index for index in pending if index < count)
+
+
+def save_output(module, index, command, output):
+    """Writes the output of a command to a file of output_dir"""
+    name = re.sub(r'[^\w.-]+', '_', command['command']).strip('_')
+    path = os.path.join(module.params['output_dir'], '%02d_%s.txt' % (index, name))
+
+    data = to_bytes(output, errors='surrogate_or_strict')
+    if module.params['compress']:
+        path += '.gz'
+        f = gzip.open(path, 'wb')
+    else:
+        f = open(path, 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+    return dict(command=command['command'], path=path, size=len(data),
+                checksum=hashlib.sha1(data).hexdigest())
 
 
 def main():
@@ -133,7 +262,16 @@ def main():
         match=dict(default='all', choices=['all', 'any']),
 
         retries=dict(default=10, type='int'),
-        interval=dict(default=1, type='int')
+        interval=dict(default=1, type='int'),
+        backoff=dict(default=1, type='float'),
+        jitter=dict(default=False, type='bool'),
+        timeout=dict(type='int'),
+
+        output_dir=dict(type='path'),
+        compress=dict(default=False, type='bool'),
+
+        result_format=dict(default='full', choices=['full', 'stdout', 'checksum']),
+        filter=dict()
     )
 
     module = AnsibleModule(argument_spec=argument_spec,
@@ -149,12 +287,41 @@ def main():
     except AttributeError as exc:
         module.fail_json(msg=to_text(exc))
 
+    lines_filter = None
+    if module.params['filter']:
+        try:
+            lines_filter = re.compile(module.params['filter'])
+        except re.error as exc:
+            module.fail_json(msg='Invalid filter: %s' % to_text(exc))
+
+    output_dir = module.params['output_dir']
+    if output_dir and not os.path.isdir(output_dir):
+        module.fail_json(msg='The output directory needs to be created in advance.')
+
+    if output_dir and not conditionals:
+        files = list()
+        for index, command in enumerate(commands):
+            output = run_commands(module, [command])
+            files.append(save_output(module, index, command, output[0]))
+
+        result['output_files'] = files
+        module.exit_json(**result)
+
     retries = module.params['retries']
     interval = module.params['interval']
     match = module.params['match']
 
+    deadline = None
+    if module.params['timeout']:
+        deadline = time.time() + module.params['timeout']
+
+    responses = [None] * len(commands)
+    pending = list(range(len(commands)))
+
     while retries > 0:
-        responses = run_commands(module, commands)
+        output = run_commands(module, [commands[index] for index in pending])
+        for index, out in zip(pending, output):
+            responses[index] = out
 
         for item in list(conditionals):
             if item(responses):
@@ -163,21 +330,47 @@ def main():
                     break
                 conditionals.remove(item)
 
-        if not conditionals:
+        retries -= 1
+        if not conditionals or not retries:
             break
 
-        time.sleep(interval)
-        retries -= 1
+        delay = interval
+        if module.params['jitter']:
+            delay = random.uniform(delay / 2.0, delay)
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            delay = min(delay, remaining)
+
+        time.sleep(delay)
+        interval *= module.params['backoff']
+        pending = get_pending(conditionals, len(commands))
+
+        # the next poll must be answered by the device, not by the command cache
+        clear_command_cache(module)
 
     if conditionals:
         failed_conditions = [item.raw for item in conditionals]
         msg = 'One or more conditional statements have not been satisfied'
         module.fail_json(msg=msg, failed_conditions=failed_conditions)
 
-    result.update({
-        'stdout': responses,
-        'stdout_lines': list(to_lines(responses))
-    })
+    if output_dir:
+        result['output_files'] = [save_output(module, index, command, output)
+                                  for index, (command, output) in enumerate(zip(commands, responses))]
+    else:
+        if lines_filter:
+            responses = ['\n'.join(line for line in out.splitlines() if lines_filter.search(line))
+                         for out in responses]
+
+        result_format = module.params['result_format']
+        if result_format == 'checksum':
+            result['stdout_checksum'] = [hashlib.sha1(to_bytes(out, errors='surrogate_or_strict')).hexdigest()
+                                         for out in responses]
+        else:
+            result['stdout'] = responses
+            if result_format == 'full':
+                result['stdout_lines'] = list(to_lines(responses))
 
     module.exit_json(**result)
 
@@ -54,6 +54,9 @@ options:
         the opportunity to perform configuration commands prior to pushing
         any changes without affecting how the set of commands are matched
         against the system.
+      - The commands pushed are compacted, a command is not sent when a
+        later command of the same section repeats it, overrides its value
+        or undoes it with its C(no) form.
     type: list
   after:
     description:
@@ -95,13 +98,59 @@ options:
         every task in a playbook.  The I(running_config) argument allows the
         implementer to pass in the configuration to use as the base
         config for comparison.
+      - With I(running_config) in check mode, the device is not connected
+        to, the task only returns the C(commands) of I(lines) missing from
+        the given configuration.  This allows saved configurations to be
+        checked offline, with the C(local) connection.
     type: str
     aliases: ['config']
+  checkpoint:
+    description:
+      - Path to a local file where the progress of the push is recorded,
+        usually one per host, e.g. C(/var/tmp/{{ inventory_hostname }}.push).
+        The number of lines acknowledged by the device and a digest of the
+        commands are written after each line, and the file is removed once
+        all the commands are pushed.
+    type: path
+  resume:
+    description:
+      - Continues a push that failed part way from the last line recorded
+        in I(checkpoint), when the commands to push are the same.  The
+        modes of that line are entered again first, as told by the known
+        section lines, I(parents), the indentation of I(src) and its exits.
+        Otherwise, or when the mode of that line can not be told, all the
+        commands are pushed.
+    type: bool
+    default: 'no'
   save:
     description:
       - The C(save) argument instructs the module to save the running-
         config to the startup-config at the conclusion of the module
         running.  If check mode is specified, this argument is ignored.
+      - When the module made no change, the running-config is only saved
+        if it differs from the startup-config, comment and blank lines
+        being ignored in the comparison.
+    type: bool
+    default: 'no'
+  queue:
+    description:
+      - Queues the change on the connection instead of pushing it.  The
+        queued changes of the host are diffed against one running config
+        and pushed at once by M(fos_config_flush), which returns the
+        commands of each queued task by its C(queue_id).
+      - The changes are queued until the connection is closed, flush them
+        in the same play.  Not supported with I(backup), I(save) and
+        I(checkpoint), I(running_config) is ignored.  Nothing is queued in
+        check mode.
+    type: bool
+    default: 'no'
+  save_async:
+    description:
+      - Starts the save without waiting for the device to finish writing
+        the startup-config.  A token is returned in C(save_token), the
+        outcome is checked by a later task with M(fos_save_status).
+        Commands sent over the connection before then wait for the save
+        to complete.
     type: bool
     default: 'no'
   backup:
@@ -131,6 +180,35 @@ options:
           - This option provides the path ending with directory name in which the backup
             configuration file will be stored. The backup path needs to be created in advance.
         type: path
+      return_contents:
+        description:
+          - Returns the backed up configuration in the C(__backup__) key of the result.  When
+            set to I(no), the configuration is only written to the backup file and the result
+            holds its path and checksum.
+        type: bool
+        default: 'yes'
+      compress:
+        description:
+          - Compresses the backup file with gzip, a C(.gz) extension is added to its name.
+        type: bool
+        default: 'no'
+      skip_unchanged:
+        description:
+          - Does not write a new backup file when the most recent file of I(dir_path) has the
+            same content, its path is returned instead.
+        type: bool
+        default: 'no'
+      store_dir:
+        description:
+          - Path to a backup store used instead of I(dir_path).  The store keeps each distinct
+            configuration once, stores the successive backups of a host as deltas against the
+            previous one, and indexes them by time for the C(fujitsu.fos.fos_backup) lookup.
+        type: path
+      store_key:
+        description:
+          - The name of the host in the backup store, usually C({{ inventory_hostname }}).
+            Required with I(store_dir).
+        type: str
     type: dict
 """
 EXAMPLES = """
@@ -157,16 +235,116 @@ EXAMPLES = """
     lines:
       - switchport access vlan 30
     parents: interface 0/36
+
+- name: backup configuration file only when it has changed
+  fos_config:
+    backup: yes
+    backup_options:
+      dir_path: "/var/backups/{{ inventory_hostname }}"
+      return_contents: no
+      compress: yes
+      skip_unchanged: yes
+
+- name: backup configuration to the backup store
+  fos_config:
+    backup: yes
+    backup_options:
+      store_dir: /var/backups/fos
+      store_key: "{{ inventory_hostname }}"
+      return_contents: no
+
+- name: push a large configuration, continuing where a previous attempt failed
+  fos_config:
+    src: site.cfg
+    checkpoint: "/var/tmp/{{ inventory_hostname }}.push"
+    resume: yes
+
+- name: check a saved configuration offline
+  fos_config:
+    lines: ip routing
+    running_config: "{{ lookup('file', 'backups/' + inventory_hostname + '.cfg') }}"
+  connection: local
+  check_mode: yes
+  register: compliance
+
+- name: queue the changes of consecutive tasks
+  fos_config:
+    lines: "description {{ item.description }}"
+    parents: "interface {{ item.name }}"
+    queue: yes
+  loop: "{{ interfaces }}"
+  register: queued
+
+- name: push the queued changes at once
+  fos_config_flush:
+    queue_ids: "{{ queued.results | map(attribute='queue_id') | list }}"
+
+- name: start saving the configuration and check it at the end of the play
+  fos_config:
+    save: yes
+    save_async: yes
+  register: result
+
+- fos_save_status:
+    token: "{{ result.save_token }}"
+"""
+
+RETURN = """
+updates:
+  description: The set of commands that will be pushed to the remote device
+  returned: always
+  type: list
+  sample: ['interface 0/16', 'lldp transmit']
+commands:
+  description: The set of commands that will be pushed to the remote device
+  returned: always
+  type: list
+  sample: ['interface 0/16', 'lldp transmit']
+backup_path:
+  description: The full path to the backup file
+  returned: when backup is yes and the backup file is written
+  type: str
+  sample: /var/backups/sw1/config.2020-10-01@12:00:00.gz
+backup_checksum:
+  description: The sha1 checksum of the backed up configuration
+  returned: when backup is yes and the backup file is written
+  type: str
+  sample: 0b3bc1f0a2ac8c0cd4f8e1b0e9a8a9eaa3e8dc4d
+resumed_at:
+  description: The index of the first command pushed when a push is resumed
+  returned: when the push is resumed from a checkpoint
+  type: int
+  sample: 4200
+save_token:
+  description: The token of the save to be checked with fos_save_status
+  returned: when the save is started with save_async
+  type: str
+  sample: 0f8c2b1f6f0a4a4f9c1b0f1ad7a7e6c2
+queue_id:
+  description: The id of the change queued on the connection, to be given to fos_config_flush
+  returned: when queue is yes
+  type: str
+  sample: 5d0b6c1e9a8f4f6f8e2f0a3c7b1d9e42
+backup_id:
+  description: The id of the backed up configuration in the backup store
+  returned: when backup is yes and store_dir is given
+  type: str
+  sample: 0b3bc1f0a2ac8c0cd4f8e1b0e9a8a9eaa3e8dc4d
 """
 
 
+import gzip
+import hashlib
 import os
 import time
 
-from ansible.module_utils._text import to_text
+from ansible.module_utils._text import to_bytes, to_text
 from ansible.module_utils.connection import ConnectionError
 from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import run_commands, get_config, load_config
-from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_connection
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_connection, start_save, queue_config
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import compact_commands, read_checkpoint, get_config_diff, get_parents
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import apply_commands
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.config import NetworkConfig, dumps
 
@@ -187,6 +365,105 @@ def get_candidate_config(module):
     return candidate
 
 
+def read_backup(path):
+    if path.endswith('.gz'):
+        f = gzip.open(path, 'rb')
+    else:
+        f = open(path, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+def get_latest_backup(dir_path):
+    paths = [os.path.join(dir_path, name) for name in os.listdir(dir_path)]
+    paths = [path for path in paths if os.path.isfile(path)]
+    if paths:
+        return max(paths, key=os.path.getmtime)
+
+
+def write_backup(module, path, contents):
+    """Writes the backup file once and returns its path and checksum"""
+    options = module.params['backup_options'] or dict()
+    data = to_bytes(contents, errors='surrogate_or_strict')
+    checksum = hashlib.sha1(data).hexdigest()
+
+    if options.get('skip_unchanged'):
+        latest = get_latest_backup(os.path.dirname(path))
+        if latest and hashlib.sha1(read_backup(latest)).hexdigest() == checksum:
+            return dict(backup_path=latest, backup_checksum=checksum)
+
+    if options.get('compress'):
+        path += '.gz'
+        f = gzip.open(path, 'wb')
+    else:
+        f = open(path, 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+    return dict(backup_path=path, backup_checksum=checksum)
+
+
+def get_config_digest(config):
+    """Returns the sha1 of a configuration, ignoring comment and blank lines"""
+    lines = [line.strip() for line in config.splitlines()]
+    lines = [line for line in lines if line and not line.startswith('!')]
+    return hashlib.sha1(to_bytes('\n'.join(lines), errors='surrogate_or_strict')).hexdigest()
+
+
+def push_commands(module, commands, result):
+    """Pushes the commands, with resume from the last acknowledged line"""
+    checkpoint = module.params['checkpoint']
+    kwargs = dict()
+    if checkpoint:
+        digest = hashlib.sha1(to_bytes('\n'.join(commands), errors='surrogate_or_strict')).hexdigest()
+        start = 0
+        modes = module.params['parents']
+        if module.params['resume']:
+            state = read_checkpoint(checkpoint)
+            if state and state.get('digest') == digest:
+                try:
+                    get_parents(commands, state['index'], modes)
+                    start = state['index']
+                    result['resumed_at'] = start
+                except ValueError as exc:
+                    module.warn('Pushing all the commands again, %s' % to_text(exc))
+        kwargs = dict(checkpoint=checkpoint, digest=digest, start=start, modes=modes)
+
+    connection = get_connection(module)
+    try:
+        connection.edit_config(candidate=commands, **kwargs)
+    except ConnectionError as exc:
+        msg = to_text(exc, errors='surrogate_then_replace')
+        if checkpoint:
+            msg += ', the push can be continued with resume'
+        module.fail_json(msg=msg)
+
+
+def queue_change(module, result):
+    """Queues the change on the connection until fos_config_flush"""
+    for option in ('backup', 'save', 'checkpoint'):
+        if module.params[option]:
+            module.fail_json(msg='%s is not supported with queue' % option)
+
+    if module.check_mode:
+        module.warn('Skipping the queueing of the change due to check_mode')
+        return
+
+    if module.params['src']:
+        commands = get_candidate_config(module).split('\n')
+        commands = (module.params['before'] or []) + commands + (module.params['after'] or [])
+        result['queue_id'] = queue_config(module, commands=compact_commands(commands))
+    elif module.params['lines']:
+        result['queue_id'] = queue_config(module, candidate=get_candidate_config(module),
+                                          diff_match=module.params['match'], path=module.params['parents'],
+                                          diff_replace=module.params['replace'],
+                                          before=module.params['before'], after=module.params['after'])
+
+
 def get_running_config(module, current_config=None, flags=None):
     running = module.params['running_config']
     if not running:
@@ -198,12 +475,37 @@ def get_running_config(module, current_config=None, flags=None):
     return running
 
 
+def get_config_after(module, before, commands):
+    """Returns the running config after the commands
+
+    The commands are applied to the config before the change, the running
+    config is only fetched again when their effect can not be modelled.
+    """
+    lines = apply_commands(before.split('\n'), commands)
+    if lines is not None:
+        return '\n'.join(lines)
+    if module.check_mode:
+        # nothing was pushed, the commands are shown after the config
+        return '\n'.join([before] + commands)
+
+    connection = get_connection(module)
+    try:
+        return to_text(connection.get_config(source='running'), errors='surrogate_then_replace').strip()
+    except ConnectionError as exc:
+        module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
+
+
 def main():
     """ main entry point for module execution
     """
     backup_spec = dict(
         filename=dict(),
-        dir_path=dict(type='path')
+        dir_path=dict(type='path'),
+        return_contents=dict(type='bool', default=True),
+        compress=dict(type='bool', default=False),
+        skip_unchanged=dict(type='bool', default=False),
+        store_dir=dict(type='path'),
+        store_key=dict()
     )
     argument_spec = dict(
         src=dict(type='path'),
@@ -221,7 +523,11 @@ def main():
 
         backup=dict(type='bool', default=False),
         backup_options=dict(type='dict', options=backup_spec),
-        save=dict(type='bool', default=False)
+        save=dict(type='bool', default=False),
+        save_async=dict(type='bool', default=False),
+        queue=dict(type='bool', default=False),
+        checkpoint=dict(type='path'),
+        resume=dict(type='bool', default=False)
     )
 
     mutually_exclusive = [
@@ -233,6 +539,7 @@ def main():
         ('match', 'strict', ['lines']),
         ('match', 'exact', ['lines']),
         ('replace', 'block', ['lines']),
+        ('resume', True, ['checkpoint']),
     ]
 
     module = AnsibleModule(
@@ -247,28 +554,38 @@ def main():
     warnings = list()
     result['warnings'] = warnings
 
+    if module.params['queue']:
+        queue_change(module, result)
+        module.exit_json(**result)
+
     contents = None
-    connection = get_connection(module)
+    running = None
 
     if module.params['backup']:
         filename = ''
         backup_path = ''
         contents = get_config(module)
-        result['__backup__'] = contents
-        if module.params['backup_options']:
-            filename = module.params['backup_options']['filename']
-            backup_path = module.params['backup_options']['dir_path']
+        backup_options = module.params['backup_options'] or dict()
+        if backup_options.get('return_contents', True):
+            result['__backup__'] = contents
+        if backup_options:
+            filename = backup_options['filename']
+            backup_path = backup_options['dir_path']
         if not filename:
             tstamp = time.strftime('%Y-%m-%d@%H:%M:%S', time.localtime(time.time()))
             filename = 'config.%s' % (tstamp)
-        if not backup_path:
+        if backup_options.get('store_dir'):
+            if not backup_options['store_key']:
+                module.fail_json(msg='store_key is required with store_dir')
+            store = BackupStore(backup_options['store_dir'])
+            result['backup_id'] = store.put(backup_options['store_key'], contents)
+        elif not backup_path:
             warnings.append('The backup path needs to be specified.')
         else:
             if not os.path.exists(backup_path):
                 warnings.append('The backup path needs to be created in advance.')
             else:
-                with open(backup_path + '/' + filename, 'w') as f:
-                    f.write(contents)
+                result.update(write_backup(module, os.path.join(backup_path, filename), contents))
 
     if module.params['lines']:
         match = module.params['match']
@@ -277,12 +594,8 @@ def main():
 
         candidate = get_candidate_config(module)
         running = get_running_config(module, contents)
-        try:
-            response = connection.get_diff(candidate=candidate, running=running, diff_match=match, path=path, diff_replace=replace)
-        except ConnectionError as exc:
-            module.fail_json(msg=to_text(exc, errors='surrogate_then_replace'))
-
-        config_diff = response['config_diff']
+        # diffed locally, with running_config the device is only connected to push the commands
+        config_diff = get_config_diff(candidate, running, match, path, replace)
 
         if config_diff:
             commands = config_diff.split('\n')
@@ -293,11 +606,12 @@ def main():
             if module.params['after']:
                 commands.extend(module.params['after'])
 
+            commands = compact_commands(commands)
             result['commands'] = commands
             result['updates'] = commands
             if not module.check_mode:
                 if commands:
-                    connection.edit_config(candidate=commands)
+                    push_commands(module, commands, result)
 
             result['changed'] = True
 
@@ -310,34 +624,42 @@ def main():
         if module.params['after']:
             commands.extend(module.params['after'])
 
+        commands = compact_commands(commands)
         result['commands'] = commands
         result['updates'] = commands
+        if module._diff and commands:
+            # the config before the change is read before the push
+            running = get_running_config(module, contents)
         if not module.check_mode:
             if commands:
-                connection.edit_config(candidate=commands)
-
-    running_config = module.params['running_config']
+                push_commands(module, commands, result)
 
     if module.params['save']:
-        result['changed'] = True
-        if not module.check_mode:
-            cmd = {r'command': 'copy system:running-config nvram:startup-config',
-                   r'prompt': r'Are you sure you want to save', 'answer': 'y'}
-            run_commands(module, [cmd])
-            result['saved'] = True
-        else:
-            module.warn('Skipping command `copy system:running-config nvram:startup-config`'
-                        'due to check_mode.  Configuration not copied to '
-                        'non-volatile storage')
-
-    if module._diff:
-        if not running_config:
-            output = run_commands(module, 'show running-config')
-            contents = output[0]
-        else:
-            contents = running_config
+        # changes pushed by this task always need a save, otherwise the save
+        # is only needed when the startup config lags behind the running one
+        modified = result['changed'] or bool(result.get('commands'))
+        if not modified:
+            running = get_config(module)
+            startup = get_config(module, source='startup')
+            modified = get_config_digest(running) != get_config_digest(startup)
 
-        running_config = NetworkConfig(indent=4, contents=contents)
+        if modified:
+            result['changed'] = True
+            if module.check_mode:
+                module.warn('Skipping command `copy system:running-config nvram:startup-config`'
+                            'due to check_mode.  Configuration not copied to '
+                            'non-volatile storage')
+            elif module.params['save_async']:
+                result['save_token'] = start_save(module)
+            else:
+                cmd = {r'command': 'copy system:running-config nvram:startup-config',
+                       r'prompt': r'Are you sure you want to save', 'answer': 'y'}
+                run_commands(module, [cmd])
+                result['saved'] = True
+
+    if module._diff and result.get('commands'):
+        before = running or get_running_config(module, contents)
+        result['diff'] = {'before': before, 'after': get_config_after(module, before, result['commands'])}
 
     module.exit_json(**result)
 
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 FUJITSU LIMITED.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'network'}
+
+DOCUMENTATION = """
+---
+module: fos_config_flush
+version_added: "2.10"
+short_description: Push the changes queued by fos_config on FUJITSU PSWITCH
+description:
+  - Pushes at once the changes queued on the connection by the earlier
+    M(fos_config) tasks with I(queue).  The running config is fetched once
+    and each queued change is diffed against it, as patched by the changes
+    queued before it, so that the whole queue is pushed in a single
+    configure and end cycle.
+  - When a queued change can not be modelled on the running config, the
+    changes before it are pushed and the running config is fetched again.
+  - The commands of each queued task are returned by its C(queue_id).
+  - The queue lives in the persistent connection and is lost when the
+    connection is closed, e.g. after I(persistent_connect_timeout) without
+    any task.  Give the ids of the queued changes in I(queue_ids) so that
+    the flush fails instead of silently pushing fewer changes.
+options:
+  queue_ids:
+    description:
+      - The C(queue_id) returned by each of the M(fos_config) tasks whose
+        changes are expected in the queue.  Nothing is pushed when any of
+        them is missing.
+    type: list
+    elements: str
+  save:
+    description:
+      - Saves the running-config to the startup-config when changes were
+        pushed.  Ignored in check mode.
+    type: bool
+    default: 'no'
+"""
+
+EXAMPLES = """
+- name: queue the changes of consecutive tasks
+  fos_config:
+    lines: "vlan participation include {{ item }}"
+    parents: interface 0/1
+    queue: yes
+  loop: "{{ vlans }}"
+  register: queued
+
+- name: push the queued changes at once and save them
+  fos_config_flush:
+    queue_ids: "{{ queued.results | map(attribute='queue_id') | list }}"
+    save: yes
+  register: flushed
+"""
+
+RETURN = """
+commands:
+  description: The commands pushed to the device
+  returned: always
+  type: list
+  sample: ['interface 0/1', 'vlan participation include 10', 'vlan participation include 20', 'exit']
+results:
+  description: The commands of each queued task, in the order they were queued
+  returned: always
+  type: list
+  sample: [{'id': '5d0b6c1e9a8f4f6f8e2f0a3c7b1d9e42', 'changed': True,
+            'commands': ['interface 0/1', 'vlan participation include 10']},
+           {'id': '0c7e2a4b1f9d4e3a8b6c5d2e1f0a9b87', 'changed': False, 'commands': []}]
+saved:
+  description: Whether the startup-config was written
+  returned: when save is yes and changes were pushed
+  type: bool
+  sample: True
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import flush_config, run_commands
+
+
+def main():
+    """main entry point for module execution
+    """
+    argument_spec = dict(
+        queue_ids=dict(type='list', elements='str'),
+        save=dict(type='bool', default=False)
+    )
+
+    module = AnsibleModule(argument_spec=argument_spec,
+                           supports_check_mode=True)
+
+    result = {'changed': False, 'commands': [], 'results': []}
+    if module.check_mode:
+        module.warn('Skipping the push of the queued changes due to check_mode')
+        module.exit_json(**result)
+
+    response = flush_config(module, module.params['queue_ids'])
+    result['commands'] = response['commands']
+    result['results'] = response['results']
+    result['changed'] = bool(response['commands'])
+
+    if module.params['save'] and result['changed']:
+        cmd = {r'command': 'copy system:running-config nvram:startup-config',
+               r'prompt': r'Are you sure you want to save', 'answer': 'y'}
+        run_commands(module, [cmd])
+        result['saved'] = True
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,37 @@ options:
         not be collected.
     default: [ '!config' ]
     type: list
+  cache_dir:
+    description:
+      - Path to a local directory used to keep the outputs and facts of the
+        previous run for each device.  When supplied, facts are gathered
+        incrementally, the running configuration is fetched first and when
+        its fingerprint matches the cached one, the outputs of the commands
+        that only change with the configuration or the software image are
+        taken from the cache instead of the device, and the facts parsed
+        from them only are reused.
+      - The cache is only used when the config subset is gathered, whose
+        output is the fingerprint, otherwise all the commands are sent.
+      - The directory needs to be created in advance.
+    type: path
+  cache_key:
+    description:
+      - The name of the cache entry of the device, usually
+        C({{ inventory_hostname }}).  Required with I(cache_dir).
+    type: str
+  result_format:
+    description:
+      - Shape of the configuration fact.  With C(full), the configuration
+        text is returned in C(ansible_net_config).  With C(checksum), only
+        its sha1 checksum is returned in C(ansible_net_config_checksum).
+    type: str
+    default: full
+    choices: ['full', 'checksum']
+  filter:
+    description:
+      - Regular expression selecting the lines of the configuration that
+        are returned, the other lines are dropped.
+    type: str
 """
 
 EXAMPLES = """
@@ -49,6 +80,18 @@ EXAMPLES = """
 - fos_facts:
     gather_subset:
       - "!hardware"
+
+# Collect the checksum of the interface configuration only
+- fos_facts:
+    gather_subset: config
+    result_format: checksum
+    filter: "^interface "
+
+# Collect all facts, reusing unchanged outputs of the previous run
+- fos_facts:
+    gather_subset: all
+    cache_dir: /var/cache/fos_facts
+    cache_key: "{{ inventory_hostname }}"
 """
 
 RETURN = """
@@ -92,29 +135,64 @@ ansible_net_burned_in_mac:
 # config
 ansible_net_config:
   description: The current active config from the device
-  returned: when config is configured
+  returned: when config is configured and result_format is full
+  type: str
+ansible_net_config_checksum:
+  description: The sha1 checksum of the current active config from the device
+  returned: when config is configured and result_format is checksum
   type: str
 
 """
 
+import hashlib
+import json
+import os
 import re
 
-from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import run_commands
+from ansible.module_utils._text import to_bytes, to_text
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import run_commands, parse_fields
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.six import iteritems
 
 
+# The running configuration is the fingerprint of the device state, its
+# header only changes on its own for the system up time.
+FINGERPRINT_COMMAND = 'show running-config'
+UPTIME_RE = re.compile(r'^!System Up Time.*$', re.M)
+
+
+def get_fingerprint(config):
+    config = UPTIME_RE.sub('', config)
+    return hashlib.sha1(to_bytes(config, errors='surrogate_or_strict')).hexdigest()
+
+
 class FactsBase(object):
 
     COMMANDS = list()
 
+    # Commands whose output only changes with the configuration or the
+    # software image, and can be reused while the fingerprint matches.
+    CACHEABLE = tuple()
+
+    # (fact, index of the command in COMMANDS, field of the command output)
+    FIELDS = tuple()
+
     def __init__(self, module):
         self.module = module
         self.facts = dict()
+        self.fields = list()
         self.responses = None
 
     def populate(self):
-        self.responses = run_commands(self.module, commands=self.COMMANDS, check_rc=False)
+        if self.responses is None:
+            self.responses = run_commands(self.module, commands=self.COMMANDS, check_rc=False)
+        self.parse()
+
+    def parse(self):
+        self.fields = [parse_fields(data) if data else None for data in self.responses]
+        for fact, index, name in self.FIELDS:
+            if self.fields[index] is not None:
+                self.facts[fact] = self.fields[index].get(name)
 
     def run(self, cmd):
         return run_commands(self.module, commands=cmd, check_rc=False)
@@ -124,31 +202,13 @@ class Default(FactsBase):
 
     COMMANDS = ['show version', 'show hosts']
 
-    def populate(self):
-        super(Default, self).populate()
-        data = self.responses[0]
-        if data:
-            self.facts['runtime_version'] = self.parse_runtime_version(data)
-            self.facts['bootloader_version'] = self.parse_bootloader_version(data)
+    CACHEABLE = ('show version', 'show hosts')
 
-        data = self.responses[1]
-        if data:
-            self.facts['hostname'] = self.parse_hostname(data)
-
-    def parse_runtime_version(self, data):
-        match = re.search(r'Current Runtime Version[\.]+ \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_bootloader_version(self, data):
-        match = re.search(r'Bootloader Version[\.]+ \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_hostname(self, data):
-        match = re.search(r'Host name[\.]+ \s*(.+)', data, re.M)
-        if match:
-            return match.group(1)
+    FIELDS = (
+        ('runtime_version', 0, 'Current Runtime Version'),
+        ('bootloader_version', 0, 'Bootloader Version'),
+        ('hostname', 1, 'Host name'),
+    )
 
 
 class Hardware(FactsBase):
@@ -158,64 +218,153 @@ class Hardware(FactsBase):
         'show hardware'
     ]
 
-    def populate(self):
-        super(Hardware, self).populate()
-        data = self.responses[0]
-        if data:
-            memalloc = self.parse_memallocate_mb(data)
-            memfree = self.parse_memfree_mb(data)
+    CACHEABLE = ('show hardware',)
+
+    FIELDS = (
+        ('type', 1, 'Machine Type'),
+        ('model', 1, 'Machine Model'),
+        ('serial_bunber', 1, 'Serial Number'),
+        ('burned_in_mac', 1, 'Burned In MAC Address'),
+    )
+
+    def parse(self):
+        super(Hardware, self).parse()
+        fields = self.fields[0]
+        if fields:
+            memalloc = fields.get('alloc')
+            memfree = fields.get('free')
             self.facts['memtotal_mb'] = (int(memalloc) + int(memfree)) // 1024
             self.facts['memfree_mb'] = int(memfree) // 1024
 
-        data = self.responses[1]
-        if data:
-            self.facts['type'] = self.parse_machine_type(data)
-            self.facts['model'] = self.parse_machine_model(data)
-            self.facts['serial_bunber'] = self.parse_serial_number(data)
-            self.facts['burned_in_mac'] = self.parse_burned_in_mac_address(data)
-
-    def parse_memfree_mb(self, data):
-        match = re.search(r'free      \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_memallocate_mb(self, data):
-        match = re.search(r'alloc     \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_machine_type(self, data):
-        match = re.search(r'Machine Type[\.]+ \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_machine_model(self, data):
-        match = re.search(r'Machine Model[\.]+ \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_serial_number(self, data):
-        match = re.search(r'Serial Number[\.]+ \s*(.+)', data)
-        if match:
-            return match.group(1)
-
-    def parse_burned_in_mac_address(self, data):
-        match = re.search(r'Burned In MAC Address[\.]+ \s*(.+)', data)
-        if match:
-            return match.group(1)
-
 
 class Config(FactsBase):
 
     COMMANDS = ['show running-config']
 
-    def populate(self):
-        super(Config, self).populate()
+    def parse(self):
         data = self.responses[0]
         if data:
             self.facts['config'] = data
 
 
+class FactsCache(object):
+    """Local store of the outputs and facts of the previous run of a device
+
+    facts holds the ansible_net_* facts returned by the run, as read by the
+    fos_facts inventory plugin, and subsets the facts parsed by each subset,
+    by subset name, to be reused while the fingerprint matches.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fingerprint = None
+        self.outputs = dict()
+        self.subsets = dict()
+        self.facts = dict()
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+        self.fingerprint = data.get('fingerprint')
+        self.outputs = data.get('outputs', dict())
+        self.subsets = data.get('subsets', dict())
+        self.facts = data.get('facts', dict())
+
+    def lookup(self, fingerprint):
+        """Returns the cached outputs and the facts by subset for a fingerprint"""
+        if fingerprint != self.fingerprint:
+            return dict(), dict()
+        return dict(self.outputs), dict(self.subsets)
+
+    def update(self, fingerprint, outputs, subsets):
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.outputs = dict()
+            self.subsets = dict()
+        self.outputs.update(outputs)
+        self.subsets.update(subsets)
+
+    def save(self, facts):
+        self.facts = facts
+        data = dict(fingerprint=self.fingerprint, outputs=self.outputs, subsets=self.subsets, facts=self.facts)
+
+        tmp_path = '%s.tmp' % self.path
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, self.path)
+
+
+class FactsPlanner(object):
+    """Collects the commands of the requested subsets and runs them once
+
+    Each command is sent to the device a single time, and every subset
+    parses its share of the outputs.  With a cache, the fingerprint is
+    fetched first and the cacheable outputs it still covers are not sent,
+    the subsets made of cacheable outputs only reuse their cached facts.
+    """
+
+    def __init__(self, module, instances, cache=None):
+        self.module = module
+        self.instances = instances
+        self.cache = cache
+
+    def get_cacheable(self):
+        cacheable = set()
+        for inst in self.instances:
+            cacheable.update(inst.CACHEABLE)
+        return cacheable
+
+    def get_commands(self):
+        commands = list()
+        for inst in self.instances:
+            for cmd in inst.COMMANDS:
+                if cmd not in commands:
+                    commands.append(cmd)
+        return commands
+
+    def run_commands(self, commands):
+        if not commands:
+            return dict()
+        responses = run_commands(self.module, commands=commands, check_rc=False)
+        return dict(zip(commands, responses))
+
+    def run(self):
+        commands = self.get_commands()
+        outputs = dict()
+        cached_subsets = dict()
+
+        # the fingerprint is only worth fetching when its output is gathered anyway
+        use_cache = self.cache is not None and FINGERPRINT_COMMAND in commands
+        if use_cache:
+            cacheable = self.get_cacheable()
+            fetch = [FINGERPRINT_COMMAND]
+            fetch.extend(cmd for cmd in commands if cmd not in cacheable and cmd != FINGERPRINT_COMMAND)
+            outputs.update(self.run_commands(fetch))
+
+            fingerprint = get_fingerprint(outputs[FINGERPRINT_COMMAND])
+            cached_outputs, cached_subsets = self.cache.lookup(fingerprint)
+            outputs.update(cached_outputs)
+
+        outputs.update(self.run_commands([cmd for cmd in commands if cmd not in outputs]))
+
+        subsets = dict()
+        for inst in self.instances:
+            name = type(inst).__name__
+            if name in cached_subsets and all(cmd in inst.CACHEABLE for cmd in inst.COMMANDS):
+                inst.facts = dict(cached_subsets[name])
+                continue
+            inst.responses = [outputs[cmd] for cmd in inst.COMMANDS]
+            inst.populate()
+            if use_cache and all(cmd in inst.CACHEABLE for cmd in inst.COMMANDS):
+                subsets[name] = inst.facts
+
+        if use_cache:
+            self.cache.update(fingerprint, dict((cmd, outputs[cmd]) for cmd in cacheable), subsets)
+
+
 FACT_SUBSETS = dict(
     default=Default,
     hardware=Hardware,
@@ -229,14 +378,30 @@ warnings = list()
 
 def main():
     argument_spec = dict(
-        gather_subset=dict(default=['!config'], type='list')
+        gather_subset=dict(default=['!config'], type='list'),
+        cache_dir=dict(type='path'),
+        cache_key=dict(),
+        result_format=dict(default='full', choices=['full', 'checksum']),
+        filter=dict()
     )
 
+    required_together = [
+        ('cache_dir', 'cache_key'),
+    ]
+
     module = AnsibleModule(argument_spec=argument_spec,
+                           required_together=required_together,
                            supports_check_mode=True)
 
     gather_subset = module.params['gather_subset']
 
+    lines_filter = None
+    if module.params['filter']:
+        try:
+            lines_filter = re.compile(module.params['filter'])
+        except re.error as exc:
+            module.fail_json(msg='Invalid filter: %s' % to_text(exc))
+
     runable_subsets = set()
     exclude_subsets = set()
 
@@ -272,18 +437,41 @@ def main():
     facts['gather_subset'] = list(runable_subsets)
 
     instances = list()
-    for key in runable_subsets:
+    for key in sorted(runable_subsets):
         instances.append(FACT_SUBSETS[key](module))
 
+    cache = None
+    cache_dir = module.params['cache_dir']
+    if cache_dir:
+        if 'config' not in runable_subsets:
+            warnings.append('The cache directory is only used when the config subset is gathered.')
+        elif not os.path.isdir(cache_dir):
+            warnings.append('The cache directory needs to be created in advance.')
+        else:
+            cache = FactsCache(os.path.join(cache_dir, '%s.json' % module.params['cache_key']))
+
+    FactsPlanner(module, instances, cache).run()
+
     for inst in instances:
-        inst.populate()
         facts.update(inst.facts)
 
+    if 'config' in facts:
+        config = facts.pop('config')
+        if lines_filter:
+            config = '\n'.join(line for line in config.splitlines() if lines_filter.search(line))
+        if module.params['result_format'] == 'checksum':
+            facts['config_checksum'] = hashlib.sha1(to_bytes(config, errors='surrogate_or_strict')).hexdigest()
+        else:
+            facts['config'] = config
+
     ansible_facts = dict()
     for key, value in iteritems(facts):
         key = 'ansible_net_%s' % key
         ansible_facts[key] = value
 
+    if cache is not None:
+        cache.save(ansible_facts)
+
     module.exit_json(ansible_facts=ansible_facts, warnings=warnings)
 
 
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 FUJITSU LIMITED.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'network'}
+
+DOCUMENTATION = """
+---
+module: fos_preflight
+version_added: "2.10"
+short_description: Probe the SSH servers of many FUJITSU PSWITCH at once
+description:
+  - Checks, concurrently and with a short timeout, that the SSH server of
+    each target accepts connections and sends its identification string.
+    It is meant to run once on the control node before the persistent
+    connections are opened, so that the switches that are down are left
+    out of the play instead of each holding a fork for the full connect
+    timeout.
+  - Run it once, delegated to the control node with the C(local)
+    connection, as in the examples.
+options:
+  targets:
+    description:
+      - The hosts to probe, either as C(host) or C(host:port) strings, or as
+        dicts with C(name), C(host) and optional C(port) keys.  The name of
+        a string target is the string itself.
+      - Host names are resolved concurrently, within I(timeout).
+    type: list
+    elements: raw
+    required: True
+  port:
+    description:
+      - The SSH port of the targets that do not give one.
+    type: int
+    default: 22
+  timeout:
+    description:
+      - Number of seconds each probe has to complete.
+    type: float
+    default: 3
+  banner:
+    description:
+      - Waits for the SSH identification string of the server, otherwise
+        an accepted TCP connection is enough.
+    type: bool
+    default: 'yes'
+  concurrency:
+    description:
+      - Maximum number of probes in flight at once.
+    type: int
+    default: 256
+"""
+
+EXAMPLES = """
+- name: probe all the switches of the play at once
+  fos_preflight:
+    targets: "{{ ansible_play_hosts | map('extract', hostvars, 'ansible_host') | list }}"
+    timeout: 2
+  connection: local
+  delegate_to: localhost
+  run_once: yes
+  register: preflight
+
+- name: leave out the switches that are down
+  meta: end_host
+  when: ansible_host in preflight.unreachable
+"""
+
+RETURN = """
+reachable:
+  description: The names of the targets whose SSH server answered
+  returned: always
+  type: list
+  sample: ['192.168.1.10', '192.168.1.11']
+unreachable:
+  description: The names of the targets that did not answer in time
+  returned: always
+  type: list
+  sample: ['192.168.1.12']
+results:
+  description: The outcome of each probe by target name, with its elapsed time and the error when unreachable
+  returned: always
+  type: dict
+  sample: {'192.168.1.12': {'reachable': False, 'host': '192.168.1.12', 'port': 22, 'elapsed': 2.0,
+           'msg': 'timed out connecting to 192.168.1.12:22'}}
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common._collections_compat import Mapping
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_preflight import probe_hosts
+
+
+def parse_targets(module):
+    targets = list()
+    for item in module.params['targets']:
+        if isinstance(item, Mapping):
+            if not item.get('host'):
+                module.fail_json(msg='host is required in target %s' % item)
+            targets.append((item.get('name', item['host']), item['host'], int(item.get('port') or module.params['port'])))
+            continue
+
+        host, port = str(item), module.params['port']
+        if host.count(':') == 1:
+            host, port = host.split(':')
+            if not port.isdigit():
+                module.fail_json(msg='invalid port in target %s' % item)
+            port = int(port)
+        targets.append((str(item), host, port))
+    return targets
+
+
+def main():
+    """main entry point for module execution
+    """
+    argument_spec = dict(
+        targets=dict(type='list', elements='raw', required=True),
+        port=dict(type='int', default=22),
+        timeout=dict(type='float', default=3),
+        banner=dict(type='bool', default=True),
+        concurrency=dict(type='int', default=256)
+    )
+
+    module = AnsibleModule(argument_spec=argument_spec,
+                           supports_check_mode=True)
+
+    targets = parse_targets(module)
+    results = probe_hosts(targets, module.params['timeout'], module.params['banner'], module.params['concurrency'])
+
+    names = [target[0] for target in targets]
+    result = {
+        'changed': False,
+        'reachable': [name for name in names if results[name]['reachable']],
+        'unreachable': [name for name in names if not results[name]['reachable']],
+        'results': results,
+    }
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
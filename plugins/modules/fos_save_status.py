@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 FUJITSU LIMITED.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {'metadata_version': '1.1',
+                    'status': ['preview'],
+                    'supported_by': 'network'}
+
+DOCUMENTATION = """
+---
+module: fos_save_status
+version_added: "2.10"
+short_description: Check the outcome of an asynchronous save on FUJITSU PSWITCH
+description:
+  - Waits for a save started by M(fos_config) with I(save_async) to
+    complete and reports its outcome.  The module fails when the device
+    reported an error while writing the startup-config.
+  - The save has to be started on the same persistent connection, that is
+    by an earlier task of the same play on the same host.
+options:
+  token:
+    description:
+      - The C(save_token) returned by M(fos_config).  Defaults to the most
+        recent save started on the connection.
+    type: str
+"""
+
+EXAMPLES = """
+- name: start saving the configuration
+  fos_config:
+    save: yes
+    save_async: yes
+  register: result
+
+- name: other tasks run here
+
+- name: confirm that the configuration was saved
+  fos_save_status:
+    token: "{{ result.save_token }}"
+"""
+
+RETURN = """
+saved:
+  description: Whether the startup-config was written
+  returned: always
+  type: bool
+  sample: True
+token:
+  description: The token of the checked save
+  returned: always
+  type: str
+  sample: 0f8c2b1f6f0a4a4f9c1b0f1ad7a7e6c2
+elapsed:
+  description: The time in seconds between the start and the end of the save
+  returned: always
+  type: float
+  sample: 4.2
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_save_status
+
+
+def main():
+    """main entry point for module execution
+    """
+    argument_spec = dict(
+        token=dict()
+    )
+
+    module = AnsibleModule(argument_spec=argument_spec,
+                           supports_check_mode=True)
+
+    status = get_save_status(module, module.params['token'])
+
+    result = {
+        'changed': False,
+        'saved': status['saved'],
+        'token': status['token'],
+        'elapsed': status['elapsed'],
+    }
+
+    if not status['saved']:
+        module.fail_json(msg=status.get('msg', 'failed to save the configuration'), **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
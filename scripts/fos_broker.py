@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 FUJITSU LIMITED.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Starts the fos session broker on the control node
+
+    python -m ansible_collections.fujitsu.fos.scripts.fos_broker \\
+        --socket ~/.ansible/fos_broker.sock
+
+The broker itself is in plugins/module_utils/network/fos_broker.py.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import os
+
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_broker import Broker, BrokerServer
+
+DEFAULT_SOCKET = os.path.join('~', '.ansible', 'fos_broker.sock')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keeps FUJITSU PSWITCH sessions open across playbook runs')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='path of the Unix socket to listen on')
+    parser.add_argument('--max-sessions', type=int, default=64, help='maximum number of sessions kept open')
+    parser.add_argument('--idle-timeout', type=int, default=900, help='seconds after which an idle session is closed')
+    args = parser.parse_args()
+
+    path = os.path.expanduser(args.socket)
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    if os.path.exists(path):
+        os.remove(path)
+
+    # the socket gives access to authenticated sessions
+    os.umask(0o077)
+    server = BrokerServer(path, Broker(args.max_sessions, args.idle_timeout))
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 FUJITSU LIMITED.
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Checks saved FUJITSU PSWITCH configurations against golden snippets
+
+    python -m ansible_collections.fujitsu.fos.scripts.fos_compliance \\
+        --rules rules.yml --store-dir /var/backups/fos
+
+The pass or fail matrix of the hosts and the rules is printed as JSON or
+CSV, the exit status is 1 when a rule failed.  The checker itself is in
+plugins/module_utils/network/fos_compliance.py.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import csv
+import json
+import sys
+
+from collections import OrderedDict
+
+from ansible.module_utils._text import to_native
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_compliance import check_fleet, get_sources, load_rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks saved FUJITSU PSWITCH configurations against rules')
+    parser.add_argument('--rules', required=True, help='YAML or JSON file of the rules')
+    parser.add_argument('--config-dir', help='directory of the configurations, one file per host')
+    parser.add_argument('--store-dir', help='backup store of fos_config, the latest backup of each host is checked')
+    parser.add_argument('--processes', type=int, help='number of worker processes, defaults to the number of cores')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help='output format of the matrix')
+    parser.add_argument('--details', action='store_true', help='outputs the missing commands instead of pass or fail')
+    args = parser.parse_args()
+
+    if not args.config_dir and not args.store_dir:
+        parser.error('one of --config-dir and --store-dir is required')
+
+    try:
+        rules = load_rules(args.rules)
+    except (IOError, OSError, ValueError) as exc:
+        parser.error(to_native(exc))
+    matrix, errors = check_fleet(get_sources(args.config_dir, args.store_dir), rules, args.processes)
+
+    if args.format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['host'] + [rule.name for rule in rules])
+        for host, missing in matrix.items():
+            writer.writerow([host] + [' / '.join(missing[rule.name]) if args.details else
+                                      ('fail' if missing[rule.name] else 'pass') for rule in rules])
+        for host in errors:
+            writer.writerow([host] + ['error'] * len(rules))
+    else:
+        output = OrderedDict()
+        for host, missing in matrix.items():
+            output[host] = OrderedDict((name, commands if args.details else not commands) for name, commands in missing.items())
+        json.dump(dict(results=output, errors=errors), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+    failed = errors or any(commands for missing in matrix.values() for commands in missing.values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import itertools
+import os
+import shutil
+import tempfile
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import MagicMock, call, patch
+from ansible_collections.fujitsu.fos.plugins.cliconf.fos import Cliconf, PushWindow
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import read_checkpoint
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_broker import BrokerError
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.fos_module import load_fixture
+from ansible_collections.fujitsu.fos.tests.unit.plugins.module_utils.network.fos_shell import FakeShell
+
+
+class TestFosCliconf(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = MagicMock()
+        self.connection.get_prompt.return_value = b'(PSWITCH) #'
+
+        self.cliconf = self.get_cliconf()
+
+        def send_command(command=None, **kwargs):
+            return 'output of %s' % command
+
+        self.cliconf.send_command = MagicMock(side_effect=send_command)
+
+    def get_cliconf(self):
+        cliconf = Cliconf(self.connection)
+        cliconf.set_option('command_cache', False)
+        cliconf.set_option('command_cache_ttl', 60)
+        cliconf.set_option('command_cache_size', 128)
+        cliconf.set_option('config_cache', False)
+        cliconf.set_option('config_cache_refresh', 10)
+        cliconf.set_option('push_window', 1)
+        cliconf.set_option('latency_dir', None)
+        cliconf.set_option('latency_timeout_factor', 3)
+        cliconf.set_option('latency_min_timeout', 5)
+        cliconf.set_option('broker_socket', None)
+        cliconf.set_option('read_channels', 0)
+        return cliconf
+
+    def get_fetches(self):
+        return [c for c in self.cliconf.send_command.call_args_list if c[0] == ('show running-config',)]
+
+    def test_fos_cliconf_command_cache_disabled(self):
+        self.cliconf.get('show version')
+        self.cliconf.get('show version')
+        self.assertEqual(self.cliconf.send_command.call_count, 2)
+
+    def test_fos_cliconf_command_cache(self):
+        self.cliconf.set_option('command_cache', True)
+        self.assertEqual(self.cliconf.get('show version'), 'output of show version')
+        self.cliconf.run_commands(['show version', 'show hosts'])
+        self.cliconf.get('show hosts')
+        self.assertEqual(self.cliconf.send_command.call_count, 2)
+
+    def test_fos_cliconf_command_cache_volatile(self):
+        self.cliconf.set_option('command_cache', True)
+        self.cliconf.get('show process cpu')
+        self.cliconf.get('show process cpu')
+        self.assertEqual(self.cliconf.send_command.call_count, 2)
+
+    def test_fos_cliconf_command_cache_size(self):
+        self.cliconf.set_option('command_cache', True)
+        self.cliconf.set_option('command_cache_size', 1)
+        self.cliconf.run_commands(['show hosts', 'show vlan', 'show hosts'])
+        self.assertEqual(self.cliconf.send_command.call_count, 3)
+
+    def test_fos_cliconf_command_cache_cleared_by_config(self):
+        self.cliconf.set_option('command_cache', True)
+        self.cliconf.get('show hosts')
+        self.cliconf.edit_config(['hostname "test"'])
+        self.cliconf.get('show hosts')
+        self.cliconf.get('clear counters')
+        self.cliconf.get('show hosts')
+        self.assertEqual(self.cliconf.send_command.call_count, 7)
+
+    def test_fos_cliconf_get_device_info(self):
+        outputs = {
+            'show version': 'Current Runtime Version........................ 1.3.67\n',
+            'show hardware': 'Machine Type................ Fujitsu ET-7648BRA-FOS\n'
+                             'Machine Model................................. ET-7648BRA-FOS\n',
+            'show hosts': 'Host name...................................... admin\n',
+        }
+        self.cliconf.send_command = MagicMock(side_effect=lambda command=None, **kwargs: outputs[command])
+        device_info = self.cliconf.get_device_info()
+        self.assertEqual('1.3.67', device_info['network_os_version'])
+        self.assertEqual('Fujitsu ET-7648BRA-FOS', device_info['network_os_type'])
+        self.assertEqual('ET-7648BRA-FOS', device_info['network_os_model'])
+        self.assertEqual('admin', device_info['network_os_hostname'])
+
+    def test_fos_cliconf_async_save(self):
+        cliconf = self.get_cliconf()
+        token = cliconf.start_save()
+        sent = [call[1]['command'] for call in self.connection.send.call_args_list]
+        self.assertEqual([b'copy system:running-config nvram:startup-config', b'y'], sent)
+        self.assertEqual(self.connection.receive.call_count, 0)
+
+        cliconf.get_config()
+        self.assertEqual(self.connection.receive.call_count, 1)
+        self.assertEqual(self.connection.send.call_args[1]['command'], b'show running-config')
+
+        status = cliconf.get_save_status(token)
+        self.assertTrue(status['saved'])
+        self.assertEqual(token, status['token'])
+        self.assertEqual(self.connection.receive.call_count, 1)
+
+    def test_fos_cliconf_async_save_failed(self):
+        self.connection.receive.side_effect = AnsibleConnectionFailure('% Error writing flash')
+        cliconf = self.get_cliconf()
+        cliconf.start_save()
+        status = cliconf.get_save_status()
+        self.assertFalse(status['saved'])
+        self.assertIn('writing flash', status['msg'])
+        self.assertRaises(ValueError, cliconf.get_save_status, 'unknown')
+
+    def test_fos_cliconf_config_cache(self):
+        running_config = load_fixture('fos_config', 'config.cfg').strip()
+        self.cliconf.send_command.side_effect = lambda command=None, **kwargs: running_config
+        self.cliconf.set_option('config_cache', True)
+
+        self.assertEqual(running_config, self.cliconf.get_config())
+        self.cliconf.edit_config(['interface 0/14', 'lldp receive', 'exit', 'no clock timezone'])
+        config = self.cliconf.get_config()
+        self.assertEqual(1, len(self.get_fetches()))
+        self.assertNotIn('clock timezone', config)
+        self.assertIn('interface 0/14\nlldp transmit\nlldp notification\nlldp receive\nexit', config)
+
+        self.cliconf.edit_config(['ho sw1'])
+        self.cliconf.get_config()
+        self.assertEqual(2, len(self.get_fetches()))
+
+    def test_fos_cliconf_flush_config(self):
+        running_config = load_fixture('fos_config', 'config.cfg').strip()
+        self.cliconf.send_command.side_effect = lambda command=None, **kwargs: running_config
+        candidate = 'interface 0/14\n    lldp receive\n'
+
+        queue_ids = [self.cliconf.queue_config(candidate=candidate, path=['interface 0/14']),
+                     self.cliconf.queue_config(candidate=candidate, path=['interface 0/14']),
+                     self.cliconf.queue_config(candidate='interface 0/13\n    lldp receive\n', path=['interface 0/13']),
+                     self.cliconf.queue_config(commands=['hostname sw1'])]
+        self.assertEqual(4, len(set(queue_ids)))
+        self.assertEqual(0, self.cliconf.send_command.call_count)
+
+        response = self.cliconf.flush_config(queue_ids=queue_ids)
+        self.assertEqual(['interface 0/14', 'lldp receive', 'exit', 'hostname sw1'], response['commands'])
+        self.assertEqual(list(zip(queue_ids, [True, False, False, True])),
+                         [(result['id'], result['changed']) for result in response['results']])
+        self.assertEqual(['interface 0/14', 'lldp receive'], response['results'][0]['commands'])
+        self.assertEqual(1, len(self.get_fetches()))
+        self.assertEqual(1, self.cliconf.send_command.call_args_list.count(call('end')))
+
+        self.assertEqual(dict(commands=[], results=[]), self.cliconf.flush_config())
+
+    def test_fos_cliconf_flush_config_lost(self):
+        queue_id = self.cliconf.queue_config(commands=['hostname sw1'])
+        with self.assertRaises(ValueError) as context:
+            self.cliconf.flush_config(queue_ids=[queue_id, 'f00'])
+        self.assertIn('f00', str(context.exception))
+        self.assertNotIn(call('hostname sw1'), self.cliconf.send_command.call_args_list)
+
+    def test_fos_cliconf_flush_config_unmodelled(self):
+        configs = ['hostname sw0\n', 'hostname sw1\n']
+        self.cliconf.send_command.side_effect = lambda command=None, **kwargs: (
+            configs[0] if command == 'show running-config' else 'output of %s' % command)
+
+        def pushed(*args, **kwargs):
+            configs.pop(0)
+            return list()
+        self.cliconf.edit_config = MagicMock(side_effect=pushed)
+
+        self.cliconf.queue_config(commands=['ho sw1'])
+        self.cliconf.queue_config(candidate='hostname sw1\n')
+        response = self.cliconf.flush_config()
+        self.assertEqual(['ho sw1'], response['commands'])
+        self.assertFalse(response['results'][1]['changed'])
+        self.assertEqual(2, len(self.get_fetches()))
+        self.cliconf.edit_config.assert_called_once_with(['ho sw1'])
+
+    def test_fos_cliconf_flush_config_override(self):
+        configs = ['ip routing\n', 'ip routing\nip default-gateway 10.0.0.2\n', 'ip routing\nip default-gateway 10.0.0.1\n']
+        self.cliconf.send_command.side_effect = lambda command=None, **kwargs: (
+            configs[0] if command == 'show running-config' else 'output of %s' % command)
+
+        def pushed(*args, **kwargs):
+            configs.pop(0)
+            return list()
+        self.cliconf.edit_config = MagicMock(side_effect=pushed)
+
+        self.cliconf.queue_config(candidate='ip default-gateway 10.0.0.2\n')
+        self.cliconf.queue_config(candidate='ip default-gateway 10.0.0.1\n')
+        response = self.cliconf.flush_config()
+        self.assertEqual(['ip default-gateway 10.0.0.2', 'ip default-gateway 10.0.0.1'], response['commands'])
+        self.assertEqual([True, True], [result['changed'] for result in response['results']])
+        self.assertEqual([call(['ip default-gateway 10.0.0.2']), call(['ip default-gateway 10.0.0.1'])],
+                         self.cliconf.edit_config.call_args_list)
+
+    def test_fos_cliconf_config_cache_refresh(self):
+        self.cliconf.set_option('config_cache', True)
+        self.cliconf.set_option('config_cache_refresh', 1)
+        self.cliconf.get_config()
+        self.cliconf.edit_config(['ip routing'])
+        self.cliconf.get_config()
+        self.assertEqual(2, len(self.get_fetches()))
+
+    def test_fos_cliconf_edit_config_checkpoint(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        checkpoint = os.path.join(path, 'sw1.push')
+        candidate = ['hostname sw1', 'interface 0/1', 'lldp transmit', 'lldp receive', 'exit']
+
+        def send_command(command=None, **kwargs):
+            if command == 'lldp receive':
+                raise AnsibleConnectionFailure('timeout')
+
+        self.cliconf.send_command.side_effect = send_command
+        self.assertRaises(AnsibleConnectionFailure, self.cliconf.edit_config, candidate, checkpoint=checkpoint, digest='abc')
+        self.assertEqual(dict(digest='abc', index=3), read_checkpoint(checkpoint))
+
+        self.cliconf.send_command.reset_mock(side_effect=True)
+        self.cliconf.edit_config(candidate, checkpoint=checkpoint, digest='abc', start=3)
+        sent = [c[0][0] if c[0] else c[1]['command'] for c in self.cliconf.send_command.call_args_list]
+        self.assertEqual(['configure', 'interface 0/1', 'lldp receive', 'exit', 'end'], sent)
+        self.assertFalse(os.path.exists(checkpoint))
+
+        self.cliconf.send_command.reset_mock()
+        candidate = ['vlan database', 'vlan 10', 'vlan 20']
+        self.cliconf.edit_config(candidate, checkpoint=checkpoint, digest='def', start=2, modes=['vlan database'])
+        sent = [c[0][0] if c[0] else c[1]['command'] for c in self.cliconf.send_command.call_args_list]
+        self.assertEqual(['configure', 'vlan database', 'vlan 20', 'end'], sent)
+
+    def test_fos_cliconf_push_window(self):
+        window = PushWindow(4)
+        for latency in (1.0, 0.5, 0.4, 0.4):
+            window.update(1, latency)
+        self.assertEqual(4, window.size)
+        window.update(1, 2.0)
+        self.assertEqual(2, window.size)
+
+    def test_fos_cliconf_edit_config_window(self):
+        candidate = ['interface 0/%d' % i for i in range(1, 8)]
+        self.connection._last_response = ('\n'.join(candidate)).encode()
+        self.connection.ssh_type = 'paramiko'
+        self.cliconf.set_option('push_window', 3)
+
+        with patch('time.time', side_effect=itertools.count()):
+            resp = self.cliconf.edit_config(candidate)
+
+        calls = self.cliconf.send_command.call_args_list[1:-1]
+        self.assertEqual(candidate, [c[0][0] for c in calls])
+        self.assertEqual([False, True, False, True, True, False, False],
+                         [c[1].get('sendonly', False) for c in calls])
+        self.assertEqual(candidate, resp['request'])
+
+        # with libssh every line waits for the prompt
+        self.connection.ssh_type = 'libssh'
+        self.cliconf.send_command.reset_mock()
+        with patch('time.time', side_effect=itertools.count()):
+            self.cliconf.edit_config(candidate)
+        self.assertFalse(any(c[1].get('sendonly') for c in self.cliconf.send_command.call_args_list))
+
+        # network_cli before ssh_type was added only used paramiko
+        del self.connection.ssh_type
+        self.cliconf.send_command.reset_mock()
+        with patch('time.time', side_effect=itertools.count()):
+            self.cliconf.edit_config(candidate)
+        self.assertTrue(any(c[1].get('sendonly') for c in self.cliconf.send_command.call_args_list))
+
+    def test_fos_cliconf_unknown_prompt(self):
+        self.connection.send.return_value = b'Reset the statistics? (y/n) n'
+        cliconf = self.get_cliconf()
+        self.assertRaises(AnsibleConnectionFailure, cliconf.run_commands, ['clear counters'])
+        self.assertEqual(b'n', self.connection.send.call_args[1]['answer'][-1])
+
+        self.connection.send.return_value = b'Clear the counters? (y/n) n\r\nCounters were not cleared.'
+        self.assertRaises(AnsibleConnectionFailure, cliconf.run_commands, ['clear counters'])
+        self.connection.send.return_value = b'Do you want to write the startup config? (y/n) n\nConfiguration Not Saved!'
+        self.assertRaises(AnsibleConnectionFailure, cliconf.run_commands, ['write memory'])
+
+        self.connection.send.return_value = b'Are you sure you want to save? (y/n) y\nConfiguration Saved!'
+        cliconf.run_commands(['copy system:running-config nvram:startup-config'])
+
+        self.connection.send.return_value = b'<14> Oct 19 admin: Clear counters? (y/n) answered\n<14> Oct 19 counters cleared'
+        cliconf.get('show logging buffered')
+
+    def test_fos_cliconf_latency_timeout(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.connection.get_option.side_effect = dict(host='sw1', persistent_command_timeout=30).get
+        self.cliconf.set_option('latency_dir', path)
+
+        with patch('time.time', side_effect=itertools.count(step=2)):
+            for i in range(20):
+                self.cliconf.get('show interface 0/%d' % i)
+        self.assertEqual([call('persistent_command_timeout', 30)] * 20, self.connection.set_option.call_args_list)
+
+        with patch('time.time', side_effect=itertools.count(step=2)):
+            self.cliconf.get('show interface 0/1')
+        self.assertEqual([call('persistent_command_timeout', 6), call('persistent_command_timeout', 30)],
+                         self.connection.set_option.call_args_list[-2:])
+        self.assertTrue(os.path.exists(os.path.join(path, 'sw1.json')))
+
+    def test_fos_cliconf_latency_dir_missing(self):
+        self.connection.get_option.side_effect = dict(host='sw1', persistent_command_timeout=30).get
+        self.cliconf.set_option('latency_dir', '/nonexistent/fos')
+
+        for i in range(25):
+            self.assertEqual('output of show interface 0/%d' % i, self.cliconf.get('show interface 0/%d' % i))
+        self.assertEqual(1, self.connection.queue_message.call_count)
+        self.assertEqual('warning', self.connection.queue_message.call_args[0][0])
+
+    @patch('ansible_collections.fujitsu.fos.plugins.cliconf.fos.BrokerClient')
+    def test_fos_cliconf_broker(self, client_class):
+        replies = {
+            'open': dict(reused=True, prompt='(PSWITCH) #', device_info=dict(network_os='fos', network_os_version='1.0')),
+            'send': dict(output='output of show version', prompt='(PSWITCH) #'),
+        }
+        client_class.return_value.call.side_effect = lambda method, **kwargs: replies[method]
+        cliconf = self.get_cliconf()
+        cliconf.set_option('broker_socket', '/tmp/fos_broker.sock')
+
+        self.assertEqual('output of show version', cliconf.get('show version'))
+        self.assertEqual('1.0', cliconf.get_device_info()['network_os_version'])
+        self.connection.send.assert_not_called()
+        self.connection.get_prompt.assert_not_called()
+
+    @patch('ansible_collections.fujitsu.fos.plugins.cliconf.fos.BrokerClient')
+    def test_fos_cliconf_broker_unreachable(self, client_class):
+        client_class.side_effect = BrokerError('unable to connect to the broker')
+        self.connection.send.return_value = 'output of show version'
+        cliconf = self.get_cliconf()
+        cliconf.set_option('broker_socket', '/tmp/fos_broker.sock')
+
+        self.assertEqual('output of show version', cliconf.get('show version'))
+        self.connection.queue_message.assert_called_once()
+
+    def test_fos_cliconf_read_channels(self):
+        self.connection.ssh_type = 'paramiko'
+        self.connection._play_context.become = True
+        self.connection._play_context.become_pass = None
+        self.connection.get_option.return_value = 5
+        shells = list()
+
+        def invoke_shell():
+            shells.append(FakeShell())
+            return shells[-1]
+
+        self.connection.ssh_type_conn.ssh.invoke_shell.side_effect = invoke_shell
+        cliconf = self.get_cliconf()
+        cliconf.set_option('read_channels', 3)
+        cliconf.send_command = MagicMock(return_value='output of the primary shell')
+
+        commands = ['show version', 'show hosts', 'show vlan', 'show bad', 'show hardware', 'show version']
+        responses = cliconf.run_commands(commands, check_rc=False)
+        self.assertEqual(['output of show version', 'output of show hosts', 'output of show vlan'], responses[:3])
+        self.assertIn('Invalid input', responses[3])
+        self.assertEqual(['output of show hardware', 'output of show version'], responses[4:])
+        self.assertEqual(3, len(shells))
+        cliconf.send_command.assert_not_called()
+
+        # batches changing the device stay on the primary shell
+        self.assertEqual(['output of the primary shell'] * 2, cliconf.run_commands(['show version', 'clear counters']))
+        self.assertEqual(3, len(shells))
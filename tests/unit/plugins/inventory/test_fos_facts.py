@@ -0,0 +1,97 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import shutil
+import tempfile
+
+from ansible.inventory.data import InventoryData
+from ansible.module_utils import basic
+from ansible.parsing.dataloader import DataLoader
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.fos_module import load_fixture
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import AnsibleExitJson, exit_json, fail_json, set_module_args
+from ansible_collections.fujitsu.fos.plugins.inventory.fos_facts import InventoryModule
+from ansible_collections.fujitsu.fos.plugins.modules import fos_facts
+
+
+class TestFosFactsInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+        self.options = dict(
+            cache_dir=self.cache_dir,
+            exclude_facts=['ansible_net_config'],
+            strict=False,
+            compose={},
+            groups={'lab': "ansible_net_hostname.startswith('lab')"},
+            keyed_groups=[{'key': 'ansible_net_model', 'prefix': 'model'}],
+        )
+
+        self.plugin = InventoryModule()
+        self.mock_read_config_data = patch.object(self.plugin, '_read_config_data')
+        self.mock_read_config_data.start()
+        self.addCleanup(self.mock_read_config_data.stop)
+        self.mock_get_option = patch.object(self.plugin, 'get_option', side_effect=self.options.get)
+        self.mock_get_option.start()
+        self.addCleanup(self.mock_get_option.stop)
+
+    def write(self, filename, data):
+        with open(os.path.join(self.cache_dir, filename), 'w') as f:
+            json.dump(data, f)
+
+    def run_fos_facts(self, host):
+        def run_commands(module, commands, check_rc=True):
+            return [load_fixture('fos_facts', command.replace(' ', '_')) for command in commands]
+
+        set_module_args({'gather_subset': 'all', 'cache_dir': self.cache_dir, 'cache_key': host})
+        with patch.multiple(basic.AnsibleModule, exit_json=exit_json, fail_json=fail_json):
+            with patch.object(fos_facts, 'run_commands', side_effect=run_commands):
+                with self.assertRaises(AnsibleExitJson) as context:
+                    fos_facts.main()
+        return context.exception.args[0]['ansible_facts']
+
+    def test_fos_facts_inventory(self):
+        self.run_fos_facts('switch1')
+        # the second run takes its outputs and facts from the cache
+        ansible_facts = self.run_fos_facts('switch1')
+        self.write('switch2', {'ansible_net_hostname': 'lab-edge', 'ansible_net_model': 'ET-7648BRA-FOS'})
+        self.write('switch3.json.tmp', {})
+
+        inventory = InventoryData()
+        self.plugin.parse(inventory, DataLoader(), 'fos_facts.yml')
+
+        self.assertEqual(sorted(inventory.hosts), ['switch1', 'switch2'])
+        self.assertEqual(sorted(h.name for h in inventory.groups['model_ET_7648BRA_FOS'].get_hosts()), ['switch1', 'switch2'])
+        self.assertEqual([h.name for h in inventory.groups['lab'].get_hosts()], ['switch2'])
+
+        host_vars = inventory.get_host('switch1').get_vars()
+        self.assertEqual('admin', host_vars['ansible_net_hostname'])
+        self.assertEqual('ET-7648BRA-FOS', host_vars['ansible_net_model'])
+        self.assertNotIn('ansible_net_config', host_vars)
+        for key, value in ansible_facts.items():
+            if key != 'ansible_net_config':
+                self.assertEqual(value, host_vars[key])
+        self.assertFalse([key for key in host_vars if key in ('Default', 'Hardware', 'Config', 'subsets', 'outputs')])
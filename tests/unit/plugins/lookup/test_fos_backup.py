@@ -0,0 +1,64 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import shutil
+import tempfile
+
+from ansible.errors import AnsibleError
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.plugins.lookup.fos_backup import LookupModule
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
+
+
+class TestFosBackupLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir)
+        store = BackupStore(self.store_dir)
+        store.put('sw1', 'hostname first', timestamp=1000)
+        store.put('sw1', 'hostname second', timestamp=2000)
+
+        self.options = dict(store_dir=self.store_dir, date=None, versions=False)
+        self.plugin = LookupModule()
+        self.mock_set_options = patch.object(self.plugin, 'set_options')
+        self.mock_set_options.start()
+        self.addCleanup(self.mock_set_options.stop)
+        self.mock_get_option = patch.object(self.plugin, 'get_option', side_effect=lambda k: self.options[k])
+        self.mock_get_option.start()
+        self.addCleanup(self.mock_get_option.stop)
+
+    def test_fos_backup_lookup_latest(self):
+        self.assertEqual(['hostname second'], self.plugin.run(['sw1']))
+
+    def test_fos_backup_lookup_date(self):
+        self.options['date'] = '1500'
+        self.assertEqual(['hostname first'], self.plugin.run(['sw1']))
+
+    def test_fos_backup_lookup_versions(self):
+        self.options['versions'] = True
+        result = self.plugin.run(['sw1'])
+        self.assertEqual([1000, 2000], [item['timestamp'] for item in result[0]])
+
+    def test_fos_backup_lookup_missing(self):
+        self.options['date'] = '500'
+        self.assertRaises(AnsibleError, self.plugin.run, ['sw1'])
@@ -0,0 +1,74 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import socket
+import threading
+
+
+class FakeShell(object):
+    """Stand-in for the SSH shell of a PSWITCH, answered by a thread"""
+
+    def __init__(self):
+        self.sock, self.device = socket.socketpair()
+        self.closed = False
+        self.commands = list()
+        self.prompt = b'(PSWITCH) >'
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def run(self):
+        self.device.sendall(b'\r\nUser:admin logged in\r\n' + self.prompt)
+        buf = b''
+        while True:
+            data = self.device.recv(1024)
+            if not data:
+                break
+            buf += data
+            while b'\r' in buf:
+                line, buf = buf.split(b'\r', 1)
+                self.commands.append(line)
+                self.device.sendall(line + b'\r\n' + self.reply(line) + self.prompt)
+        self.device.close()
+
+    def reply(self, line):
+        if line == b'enable' or line == b'end':
+            self.prompt = b'(PSWITCH) #'
+        elif line == b'configure':
+            self.prompt = b'(PSWITCH) (Config)#'
+        elif line.startswith(b'show bad'):
+            return b'% Invalid input detected at ^ marker.\r\n'
+        elif line.startswith(b'show'):
+            return b'output of ' + line + b'\r\n'
+        return b''
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def recv(self, size):
+        return self.sock.recv(size)
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
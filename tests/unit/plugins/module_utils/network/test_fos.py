@@ -0,0 +1,104 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.fos_module import load_fixture
+from ansible_collections.fujitsu.fos.plugins.module_utils.network import fos
+
+
+class TestFosModuleUtils(unittest.TestCase):
+
+    def test_fos_parse_fields(self):
+        fields = fos.parse_fields(load_fixture('fos_facts', 'show_hosts'))
+        self.assertEqual('admin', fields['Host name'])
+        self.assertEqual('(not configured)', fields['Dns Client Source Interface'])
+
+    def test_fos_parse_fields_table(self):
+        fields = fos.parse_fields(load_fixture('fos_facts', 'show_process_cpu'))
+        self.assertEqual('1360596', fields['free'])
+        self.assertEqual('2683828', fields['alloc'])
+
+    def test_fos_apply_commands(self):
+        lines = load_fixture('fos_config', 'config.cfg').strip().split('\n')
+        commands = ['clock timezone 8 minutes 0', 'no interface 0/13', 'interface 0/20', 'lldp transmit', 'exit']
+        patched = fos.apply_commands(lines, commands)
+        self.assertIn('clock timezone 8 minutes 0', patched)
+        self.assertNotIn('clock timezone 9 minutes 0', patched)
+        self.assertNotIn('interface 0/13', patched)
+        self.assertEqual(['interface 0/20', 'lldp transmit', 'exit', '', 'exit'], patched[-5:])
+
+    def test_fos_apply_commands_unmodelled(self):
+        lines = load_fixture('fos_config', 'config.cfg').strip().split('\n')
+        self.assertIsNone(fos.apply_commands(lines, ['no ip domain lookup']))
+        self.assertIsNone(fos.apply_commands(lines, ['interface 0/14', 'no lldp receive']))
+        self.assertIsNone(fos.apply_commands(lines, ['exit', 'reload']))
+        lines.extend(['ip default-gateway 10.0.0.2', 'snmp-server location "rack 1"'])
+        self.assertIsNone(fos.apply_commands(lines, ['ip default-gateway 10.0.0.1']))
+        self.assertIsNone(fos.apply_commands(lines, ['snmp-server location "rack 2"']))
+        self.assertIsNone(fos.apply_commands(lines, ['interface 0/14', 'ip address 10.0.0.1 255.255.255.0', 'exit']))
+        self.assertIsNotNone(fos.apply_commands(lines, ['ip default-gateway 10.0.0.2']))
+
+    def test_fos_compact_commands(self):
+        commands = ['clock timezone 8 minutes 0', 'ip routing', 'interface 0/1', 'lldp transmit', 'no lldp transmit',
+                    'lldp receive', 'lldp receive', 'exit', 'clock timezone 7 minutes 0', 'no ip routing']
+        self.assertEqual(['clock timezone 8 minutes 0', 'ip routing', 'interface 0/1', 'no lldp transmit', 'lldp receive', 'exit',
+                          'clock timezone 7 minutes 0', 'no ip routing'], fos.compact_commands(commands))
+
+    def test_fos_get_parents(self):
+        commands = ['hostname sw1', 'interface 0/1', 'lldp transmit', 'exit', 'hostname sw2']
+        self.assertEqual(['interface 0/1'], fos.get_parents(commands, 2))
+        self.assertEqual([], fos.get_parents(commands, 4))
+        commands = ['router bgp 1', '  address-family ipv4', '    network 10.0.0.0', '  exit', '  neighbor 10.0.0.1', 'exit']
+        self.assertEqual(['router bgp 1', 'address-family ipv4'], fos.get_parents(commands, 2))
+        self.assertEqual(['router bgp 1'], fos.get_parents(commands, 4))
+        commands = ['hostname sw1', 'vlan database', 'vlan 10', 'vlan 20', 'exit']
+        self.assertRaises(ValueError, fos.get_parents, commands, 3)
+        self.assertEqual(['vlan database'], fos.get_parents(commands, 3, ['vlan database']))
+
+    def test_fos_get_prompts(self):
+        prompts, answers = fos.get_prompts('copy system:running-config nvram:startup-config', 'Are you sure', 'y')
+        self.assertEqual('Are you sure', prompts[0])
+        self.assertEqual(len(prompts), len(answers))
+        self.assertEqual(['y', 'y', 'y', 'n'], answers)
+
+        prompts, answers = fos.get_prompts('show version')
+        self.assertEqual([fos.CONFIRM_PROMPT_RE.pattern], prompts)
+
+    def test_fos_get_unknown_prompt(self):
+        output = 'This operation may take a few minutes.\nClear the counters? (y/n) n'
+        self.assertEqual('Clear the counters? (y/n) n', fos.get_unknown_prompt(output, []))
+        self.assertIsNone(fos.get_unknown_prompt(output, ['Clear the counters']))
+        self.assertIsNone(fos.get_unknown_prompt('Configuration Saved!', []))
+        output = 'Do you want to write the startup config? (y/n) n\nConfiguration Not Saved!'
+        self.assertEqual('Do you want to write the startup config? (y/n) n', fos.get_unknown_prompt(output, []))
+        output = 'Clear the counters? (y/n) n\r\nCounters were not cleared.\r\n'
+        self.assertEqual('Clear the counters? (y/n) n', fos.get_unknown_prompt(output, []))
+        self.assertIsNone(fos.get_unknown_prompt('Overwrite the config? (y/n) y\nConfiguration Saved!', ['Overwrite']))
+        self.assertIsNone(fos.get_unknown_prompt('<14> Oct 19 admin answered Clear counters? (y/n) at console\nEnd of log', []))
+        self.assertTrue(fos.CONFIRM_PROMPT_RE.search('\r\nClear the counters? (y/n) '))
+        self.assertFalse(fos.CONFIRM_PROMPT_RE.search('Clear counters? (y/n) at console\r\n(PSWITCH) #'))
+
+    def test_fos_get_config_diff(self):
+        running = load_fixture('fos_config', 'config.cfg')
+        candidate = 'interface 0/14\n    lldp transmit\n    lldp receive\n'
+        self.assertEqual('interface 0/14\nlldp receive', fos.get_config_diff(candidate, running, path=['interface 0/14']))
+        self.assertEqual('', fos.get_config_diff('ip routing', running))
+        self.assertEqual('ip routing', fos.get_config_diff('ip routing', running, diff_match='none'))
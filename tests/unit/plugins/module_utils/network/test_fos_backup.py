@@ -0,0 +1,58 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import tempfile
+
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.fos_module import load_fixture
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
+
+
+class TestFosBackupStore(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = BackupStore(self.path, max_chain=3)
+        self.config = load_fixture('fos_config', 'config.cfg')
+
+    def count_objects(self):
+        return sum(len(files) for _, _, files in os.walk(os.path.join(self.path, 'objects')))
+
+    def test_fos_backup_store_dedup(self):
+        first = self.store.put('sw1', self.config, timestamp=100)
+        self.assertEqual(first, self.store.put('sw1', self.config, timestamp=200))
+        self.assertEqual(first, self.store.put('sw2', self.config, timestamp=200))
+        self.assertEqual(1, self.count_objects())
+        self.assertEqual([(100, first)], self.store.get_versions('sw1'))
+
+    def test_fos_backup_store_point_in_time(self):
+        configs = [self.config.replace('9 minutes', '%d minutes' % i) for i in range(5)]
+        for index, config in enumerate(configs):
+            self.store.put('sw1', config, timestamp=100 * (index + 1))
+
+        self.assertEqual(5, self.count_objects())
+        self.assertIsNone(self.store.lookup('sw1', 99))
+        for index, config in enumerate(configs):
+            self.assertEqual(config, self.store.read(self.store.lookup('sw1', 100 * (index + 1) + 50)))
+        self.assertEqual(configs[-1], self.store.read(self.store.lookup('sw1')))
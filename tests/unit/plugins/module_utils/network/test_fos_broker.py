@@ -0,0 +1,123 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.plugins.module_utils.network.fos_shell import FakeShell
+from ansible_collections.fujitsu.fos.plugins.module_utils.network import fos_broker
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_broker import Broker, BrokerClient, BrokerError, BrokerServer
+from ansible_collections.fujitsu.fos.plugins.terminal.fos import TerminalModule
+
+
+class TestFosBroker(unittest.TestCase):
+
+    def setUp(self):
+        self.shells = list()
+        self.request = dict(host='sw1', username='admin', password='secret', become=True, timeout=5)
+
+    def connect(self, request):
+        self.shells.append(FakeShell())
+        return None, self.shells[-1]
+
+    def test_fos_broker_terminal_re(self):
+        self.assertEqual([regex.pattern for regex in TerminalModule.terminal_stdout_re],
+                         [regex.pattern for regex in fos_broker.STDOUT_RE])
+        self.assertEqual([(regex.pattern, regex.flags) for regex in TerminalModule.terminal_stderr_re],
+                         [(regex.pattern, regex.flags) for regex in fos_broker.STDERR_RE])
+
+    def test_fos_broker_reuse(self):
+        broker = Broker(connect=self.connect)
+        session, reused = broker.lease(self.request)
+        self.assertFalse(reused)
+        self.assertEqual('(PSWITCH) #', session.prompt)
+        self.assertEqual([b'terminal length 0', b'enable'], self.shells[0].commands)
+        self.assertEqual('output of show version', session.send('show version'))
+        self.assertRaises(BrokerError, session.send, 'show bad')
+        broker.release(session)
+
+        again, reused = broker.lease(self.request)
+        self.assertTrue(reused)
+        self.assertIs(session, again)
+        self.assertEqual(1, len(self.shells))
+
+        other, reused = broker.lease(dict(self.request, password='other'))
+        self.assertFalse(reused)
+        self.assertEqual(2, len(self.shells))
+
+    def test_fos_broker_max_sessions(self):
+        broker = Broker(max_sessions=1, connect=self.connect)
+        first, dummy = broker.lease(self.request)
+        self.assertRaises(BrokerError, broker.lease, dict(self.request, host='sw2'))
+
+        broker.release(first)
+        second, reused = broker.lease(dict(self.request, host='sw2'))
+        self.assertFalse(reused)
+        self.assertTrue(self.shells[0].closed)
+        self.assertEqual([second], broker.sessions)
+
+    def test_fos_broker_idle_eviction(self):
+        broker = Broker(idle_timeout=60, connect=self.connect)
+        session, dummy = broker.lease(self.request)
+        broker.release(session)
+
+        broker.evict(time.time() + 30)
+        self.assertEqual([session], broker.sessions)
+        broker.evict(time.time() + 90)
+        self.assertEqual([], broker.sessions)
+        self.assertTrue(self.shells[0].closed)
+
+    def test_fos_broker_server(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        broker = Broker(connect=self.connect)
+        server = BrokerServer(os.path.join(path, 'broker.sock'), broker)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        client = BrokerClient(os.path.join(path, 'broker.sock'))
+        self.assertFalse(client.call('open', **self.request)['reused'])
+        self.assertEqual('(PSWITCH) (Config)#', client.call('send', command='configure')['prompt'])
+        client.call('set_device_info', device_info=dict(network_os='fos'))
+        client.close()
+
+        # the session is released, out of configuration mode, once the client is gone
+        for dummy in range(100):
+            if not broker.sessions[0].leased:
+                break
+            time.sleep(0.01)
+        self.assertEqual(b'end', self.shells[0].commands[-1])
+
+        client = BrokerClient(os.path.join(path, 'broker.sock'))
+        session = client.call('open', **self.request)
+        self.assertTrue(session['reused'])
+        self.assertEqual('(PSWITCH) #', session['prompt'])
+        self.assertEqual(dict(network_os='fos'), session['device_info'])
+        self.assertEqual('output of show hosts', client.call('send', command='show hosts')['output'])
+        client.close()
+        self.assertEqual(1, len(self.shells))
@@ -0,0 +1,109 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import shutil
+import tempfile
+
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.fos_module import load_fixture
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import get_config_diff
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_compliance import Rule, check_config, check_fleet
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_compliance import get_sources, load_rules
+
+
+class TestFosCompliance(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.config = load_fixture('fos_config', 'config.cfg')
+        self.rules = [
+            Rule('routing', lines=['ip routing']),
+            Rule('hostname', lines='hostname "admin"'),
+            Rule('lldp_0/13', lines=['lldp transmit', 'lldp receive'], parents=['interface 0/13']),
+            Rule('lldp_0/14', lines=['lldp transmit', 'lldp receive'], parents=['interface 0/14']),
+        ]
+
+    def test_fos_compliance_check_config(self):
+        missing = check_config(self.config, self.rules)
+        self.assertEqual(['routing', 'hostname', 'lldp_0/13', 'lldp_0/14'], list(missing))
+        self.assertEqual([], missing['routing'])
+        self.assertEqual([], missing['lldp_0/13'])
+        self.assertEqual(['interface 0/14', 'lldp receive'], missing['lldp_0/14'])
+
+    def test_fos_compliance_check_config_index(self):
+        rules = self.rules + [
+            Rule('strict_0/14', lines=['lldp transmit', 'lldp receive'], parents=['interface 0/14'], match='strict'),
+            Rule('block_0/14', lines=['lldp receive'], parents=['interface 0/14'], replace='block'),
+        ]
+        missing = check_config(self.config, rules)
+        for rule in rules:
+            diff = get_config_diff(rule.candidate, self.config, rule.match, rule.parents, rule.replace)
+            self.assertEqual(diff.split('\n') if diff else [], missing[rule.name])
+
+    def test_fos_compliance_check_fleet(self):
+        os.mkdir(os.path.join(self.path, 'configs'))
+        for host in ('sw1', 'sw2', 'sw3'):
+            config = self.config.replace('ip routing', '') if host == 'sw2' else self.config
+            with open(os.path.join(self.path, 'configs', '%s.cfg' % host), 'w') as f:
+                f.write(config)
+        BackupStore(os.path.join(self.path, 'store')).put('sw4', self.config.replace('admin', 'sw4'))
+
+        sources = get_sources(os.path.join(self.path, 'configs'), os.path.join(self.path, 'store'))
+        sources.append(('sw5', 'file', os.path.join(self.path, 'missing.cfg')))
+        matrix, errors = check_fleet(sources, self.rules, processes=2)
+
+        self.assertEqual(['sw1', 'sw2', 'sw3', 'sw4'], list(matrix))
+        self.assertEqual(['sw5'], list(errors))
+        passed = dict((host, [name for name, commands in missing.items() if not commands]) for host, missing in matrix.items())
+        self.assertEqual(['routing', 'hostname', 'lldp_0/13'], passed['sw1'])
+        self.assertEqual(['hostname', 'lldp_0/13'], passed['sw2'])
+        self.assertEqual(['routing', 'lldp_0/13'], passed['sw4'])
+
+    def test_fos_compliance_load_rules(self):
+        path = os.path.join(self.path, 'rules.yml')
+        with open(path, 'w') as f:
+            f.write('- name: routing\n  lines: [ip routing]\n- lines: [ip routing]\n')
+        self.assertRaises(ValueError, load_rules, path)
+
+        with open(path, 'w') as f:
+            f.write('- name: routing\n  lines: [ip routing]\n  parent: [interface 0/1]\n')
+        with self.assertRaises(ValueError) as context:
+            load_rules(path)
+        self.assertIn('parent', str(context.exception))
+
+        with open(path, 'w') as f:
+            f.write('- name: routing\n  lines: [ip routing]\n  match: exact\n')
+        self.assertEqual(['routing'], [rule.name for rule in load_rules(path)])
+
+    @patch('ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_compliance.HAS_YAML', False)
+    def test_fos_compliance_load_rules_json(self):
+        path = os.path.join(self.path, 'rules.json')
+        with open(path, 'w') as f:
+            f.write('[{"name": "routing", "lines": ["ip routing"]}]')
+        self.assertEqual(['routing'], [rule.name for rule in load_rules(path)])
+
+        with open(path, 'w') as f:
+            f.write('- name: routing\n  lines: [ip routing]\n')
+        self.assertRaises(ValueError, load_rules, path)
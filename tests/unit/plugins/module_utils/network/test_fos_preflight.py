@@ -0,0 +1,98 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import socket
+import threading
+import time
+
+from ansible_collections.fujitsu.fos.tests.unit.compat import unittest
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_preflight import probe_hosts
+
+
+class TestFosPreflight(unittest.TestCase):
+
+    def listen(self, banner=None):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(8)
+        self.addCleanup(server.close)
+
+        if banner is not None:
+            def serve():
+                conn, dummy = server.accept()
+                conn.sendall(banner)
+                conn.close()
+
+            thread = threading.Thread(target=serve)
+            thread.daemon = True
+            thread.start()
+
+        return server.getsockname()[1]
+
+    def closed_port(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_fos_preflight_probe(self):
+        targets = [
+            ('ssh', '127.0.0.1', self.listen(b'SSH-2.0-OpenSSH\r\n')),
+            ('silent', '127.0.0.1', self.listen()),
+            ('refused', '127.0.0.1', self.closed_port()),
+        ]
+        results = probe_hosts(targets, timeout=0.5)
+
+        self.assertTrue(results['ssh']['reachable'])
+        self.assertFalse(results['silent']['reachable'])
+        self.assertIn('SSH banner', results['silent']['msg'])
+        self.assertFalse(results['refused']['reachable'])
+
+    def test_fos_preflight_probe_without_banner(self):
+        results = probe_hosts([('silent', '127.0.0.1', self.listen())], timeout=0.5, banner=False)
+        self.assertTrue(results['silent']['reachable'])
+
+    def test_fos_preflight_probe_concurrency(self):
+        port = self.listen()
+        targets = [('silent%d' % i, '127.0.0.1', port) for i in range(4)]
+        results = probe_hosts(targets, timeout=0.2, concurrency=2)
+        self.assertEqual(4, len(results))
+        self.assertFalse(any(result['reachable'] for result in results.values()))
+
+    def test_fos_preflight_probe_resolve(self):
+        port = self.listen(b'SSH-2.0-OpenSSH\r\n')
+        getaddrinfo = socket.getaddrinfo
+
+        def slow_getaddrinfo(host, *args):
+            if host == 'slow':
+                time.sleep(1)
+            return getaddrinfo('127.0.0.1', *args)
+
+        started = time.time()
+        with patch('socket.getaddrinfo', side_effect=slow_getaddrinfo):
+            results = probe_hosts([('ssh', 'fast', port), ('slow', 'slow', port)], timeout=0.3)
+        self.assertLess(time.time() - started, 1)
+        self.assertTrue(results['ssh']['reachable'])
+        self.assertFalse(results['slow']['reachable'])
+        self.assertIn('resolving', results['slow']['msg'])
@@ -21,10 +21,19 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import gzip
+import itertools
 import json
-
-from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+import os
+import shutil
+import tempfile
+import time
+
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import MagicMock, patch
+from ansible_collections.fujitsu.fos.plugins.cliconf.fos import Cliconf
+from ansible_collections.fujitsu.fos.plugins.module_utils.network import fos
 from ansible_collections.fujitsu.fos.plugins.modules import fos_command
+from ansible_collections.fujitsu.fos.tests.unit.plugins.module_utils.network.fos_shell import FakeShell
 from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import set_module_args
 from .fos_module import TestFosModule, load_fixture
 
@@ -39,9 +48,13 @@ class TestFosCommandModule(TestFosModule):
         self.mock_run_commands = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_command.run_commands')
         self.run_commands = self.mock_run_commands.start()
 
+        self.mock_clear_command_cache = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_command.clear_command_cache')
+        self.clear_command_cache = self.mock_clear_command_cache.start()
+
     def tearDown(self):
         super(TestFosCommandModule, self).tearDown()
         self.mock_run_commands.stop()
+        self.mock_clear_command_cache.stop()
 
     def load_fixtures(self, commands=None):
 
@@ -89,6 +102,7 @@ class TestFosCommandModule(TestFosModule):
         set_module_args(dict(commands=['show version'], wait_for=wait_for, retries=2))
         self.execute_module(failed=True)
         self.assertEqual(self.run_commands.call_count, 2)
+        self.assertEqual(self.clear_command_cache.call_count, 1)
 
     def test_fos_command_match_any(self):
         wait_for = ['result[0] contains "Current Runtime Version"',
@@ -108,3 +122,94 @@ class TestFosCommandModule(TestFosModule):
         commands = ['show version', 'show version']
         set_module_args(dict(commands=commands, wait_for=wait_for, match='all'))
         self.execute_module(failed=True)
+
+    def test_fos_command_wait_for_reruns_unmet(self):
+        wait_for = ['result[0] contains "Current Runtime Version"',
+                    'result[1] contains "test string"']
+        commands = ['show version', 'show version']
+        set_module_args(dict(commands=commands, wait_for=wait_for, retries=3))
+        self.execute_module(failed=True)
+        self.assertEqual(len(self.run_commands.call_args_list[0][0][1]), 2)
+        self.assertEqual(len(self.run_commands.call_args_list[1][0][1]), 1)
+        self.assertEqual(len(self.run_commands.call_args_list[2][0][1]), 1)
+
+    def test_fos_command_backoff(self):
+        wait_for = 'result[0] contains "test string"'
+        set_module_args(dict(commands=['show version'], wait_for=wait_for, retries=4, backoff=2))
+        self.execute_module(failed=True)
+        self.assertEqual([c[0][0] for c in time.sleep.call_args_list], [1, 2, 4])
+
+    def test_fos_command_timeout(self):
+        wait_for = 'result[0] contains "test string"'
+        set_module_args(dict(commands=['show version'], wait_for=wait_for, timeout=12))
+        with patch('ansible_collections.fujitsu.fos.plugins.modules.fos_command.time') as mock_time:
+            mock_time.time.side_effect = itertools.count(0, 5)
+            self.execute_module(failed=True)
+        self.assertEqual(self.run_commands.call_count, 3)
+        self.assertEqual([c[0][0] for c in mock_time.sleep.call_args_list], [1, 1])
+
+    def test_fos_command_output_dir(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        set_module_args(dict(commands=['show version', 'show version'], output_dir=output_dir, compress=True))
+        result = self.execute_module()
+        self.assertNotIn('stdout', result)
+        self.assertEqual(self.run_commands.call_count, 2)
+
+        files = result['output_files']
+        self.assertEqual(files[1]['path'], os.path.join(output_dir, '01_show_version.txt.gz'))
+        with gzip.open(files[1]['path'], 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b'Current Runtime Version'))
+        self.assertEqual(files[1]['size'], len(data))
+
+    def test_fos_command_output_dir_missing(self):
+        set_module_args(dict(commands=['show version'], output_dir='/nonexistent/fos'))
+        self.execute_module(failed=True)
+
+    def test_fos_command_result_format_stdout(self):
+        set_module_args(dict(commands=['show version'], result_format='stdout', filter='^Current Runtime'))
+        result = self.execute_module()
+        self.assertNotIn('stdout_lines', result)
+        self.assertEqual(result['stdout'][0].splitlines(), [
+            'Current Runtime Version........................ 1.3.67',
+            'Current Runtime Build Time..................... Fri Sep 11 16:35:51 CST 2020',
+        ])
+
+    def test_fos_command_result_format_checksum(self):
+        set_module_args(dict(commands=['show version'], result_format='checksum'))
+        result = self.execute_module()
+        self.assertNotIn('stdout', result)
+        self.assertEqual(len(result['stdout_checksum'][0]), 40)
+
+    def test_fos_command_read_channels(self):
+        # the batch goes through the run_commands of module_utils to the cliconf
+        self.mock_run_commands.stop()
+        self.mock_run_commands = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_command.run_commands', fos.run_commands)
+        self.mock_run_commands.start()
+
+        connection = MagicMock(ssh_type='paramiko')
+        connection.get_option.return_value = 5
+        connection._play_context.become_pass = None
+        shells = list()
+
+        def invoke_shell():
+            shells.append(FakeShell())
+            return shells[-1]
+
+        connection.ssh_type_conn.ssh.invoke_shell.side_effect = invoke_shell
+        cliconf = Cliconf(connection)
+        for option, value in (('command_cache', False), ('latency_dir', None), ('broker_socket', None), ('read_channels', 3)):
+            cliconf.set_option(option, value)
+        cliconf.send_command = MagicMock(return_value='output of the primary shell')
+
+        commands = ['show version', 'show hosts', 'show vlan', 'show hardware']
+        with patch('ansible_collections.fujitsu.fos.plugins.module_utils.network.fos.Connection') as rpc:
+            rpc.return_value.run_commands.side_effect = cliconf.run_commands
+            set_module_args(dict(commands=commands))
+            result = self.execute_module()
+
+        self.assertEqual(['output of %s' % command for command in commands], result['stdout'])
+        self.assertEqual(3, len(shells))
+        cliconf.send_command.assert_not_called()
+        rpc.return_value.get.assert_not_called()
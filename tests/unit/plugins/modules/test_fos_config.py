@@ -22,9 +22,16 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+
 from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch, MagicMock
 from ansible_collections.fujitsu.fos.plugins.modules import fos_config
-from ansible_collections.fujitsu.fos.plugins.cliconf.fos import Cliconf
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos import write_checkpoint
+from ansible_collections.fujitsu.fos.plugins.module_utils.network.fos_backup import BackupStore
 from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import set_module_args
 from .fos_module import TestFosModule, load_fixture
 
@@ -51,7 +58,6 @@ class TestFosConfigModule(TestFosModule):
         self.mock_run_commands = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_config.run_commands')
         self.run_commands = self.mock_run_commands.start()
 
-        self.cliconf_obj = Cliconf(MagicMock())
         self.running_config = load_fixture('fos_config', 'config.cfg')
 
     def tearDown(self):
@@ -70,9 +76,6 @@ class TestFosConfigModule(TestFosModule):
         args = dict(lines=lines)
         set_module_args(args)
 
-        self.conn.get_diff = MagicMock(
-            return_value=self.cliconf_obj.get_diff('\n'.join(lines), self.running_config)
-        )
         self.execute_module()
 
     def test_fos_config_lines(self):
@@ -80,11 +83,6 @@ class TestFosConfigModule(TestFosModule):
         args = dict(lines=lines)
         set_module_args(args)
 
-        self.conn.get_diff = MagicMock(
-            return_value=self.cliconf_obj.get_diff(
-                '\n'.join(lines), self.running_config
-            )
-        )
         config = ['clock timezone 8 minutes 0']
         self.execute_module(changed=True, commands=config)
 
@@ -92,14 +90,8 @@ class TestFosConfigModule(TestFosModule):
         lines = ['lldp transmit', 'lldp notification']
         parents = ['interface 0/12']
         args = dict(lines=lines, parents=parents)
-        candidate = parents + lines
         set_module_args(args)
 
-        self.conn.get_diff = MagicMock(
-            return_value=self.cliconf_obj.get_diff(
-                '\n'.join(candidate), self.running_config
-            )
-        )
         config = [
             'interface 0/12',
             'lldp transmit',
@@ -113,25 +105,23 @@ class TestFosConfigModule(TestFosModule):
         args = dict(lines=lines, before=before)
         set_module_args(args)
 
-        self.conn.get_diff = MagicMock(
-            return_value=self.cliconf_obj.get_diff(
-                '\n'.join(lines), self.running_config
-            )
-        )
         config = ['before command', 'clock timezone 8 minutes 0']
         result = self.execute_module(changed=True, commands=config)
         self.assertEqual('before command', result['commands'][0])
 
+    def test_fos_config_before_compacted(self):
+        lines = ['clock timezone 8 minutes 0', 'ip routing']
+        before = ['clock timezone 8 minutes 0', 'ip routing']
+        set_module_args(dict(lines=lines, before=before))
+
+        result = self.execute_module(changed=True, commands=['ip routing', 'clock timezone 8 minutes 0'])
+        self.assertEqual(['ip routing', 'clock timezone 8 minutes 0'], result['commands'])
+
     def test_fos_config_after(self):
         lines = ['clock timezone 8 minutes 0', 'ip routing']
         args = dict(lines=lines, after=['after command'])
 
         set_module_args(args)
-        self.conn.get_diff = MagicMock(
-            return_value=self.cliconf_obj.get_diff(
-                '\n'.join(lines), self.running_config
-            )
-        )
         config = ['after command', 'clock timezone 8 minutes 0']
         result = self.execute_module(changed=True, commands=config)
         self.assertEqual('after command', result['commands'][-1])
@@ -162,11 +152,155 @@ class TestFosConfigModule(TestFosModule):
         result = self.execute_module()
         self.assertIn('__backup__', result)
 
+    def test_fos_config_backup_to_file(self):
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        backup_options = dict(dir_path=dir_path, filename='sw1.cfg', return_contents=False, compress=True)
+        set_module_args(dict(backup=True, backup_options=backup_options))
+        result = self.execute_module()
+        self.assertNotIn('__backup__', result)
+        self.assertEqual(os.path.join(dir_path, 'sw1.cfg.gz'), result['backup_path'])
+        with gzip.open(result['backup_path'], 'rb') as f:
+            self.assertEqual(self.running_config, f.read().decode())
+        self.assertEqual(40, len(result['backup_checksum']))
+
+    def test_fos_config_backup_skip_unchanged(self):
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        backup_options = dict(dir_path=dir_path, filename='first.cfg', return_contents=False, skip_unchanged=True)
+        set_module_args(dict(backup=True, backup_options=backup_options))
+        first = self.execute_module()
+
+        backup_options['filename'] = 'second.cfg'
+        set_module_args(dict(backup=True, backup_options=backup_options))
+        second = self.execute_module()
+        self.assertEqual(first['backup_path'], second['backup_path'])
+        self.assertEqual(['first.cfg'], os.listdir(dir_path))
+
+    def test_fos_config_backup_to_store(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir)
+        backup_options = dict(store_dir=store_dir, store_key='sw1', return_contents=False)
+        set_module_args(dict(backup=True, backup_options=backup_options))
+        first = self.execute_module()
+        second = self.execute_module()
+        self.assertEqual(first['backup_id'], second['backup_id'])
+
+        store = BackupStore(store_dir)
+        self.assertEqual(1, len(store.get_versions('sw1')))
+        self.assertEqual(self.running_config, store.read(store.lookup('sw1')))
+
+    def test_fos_config_backup_to_store_requires_key(self):
+        backup_options = dict(store_dir=tempfile.gettempdir())
+        set_module_args(dict(backup=True, backup_options=backup_options))
+        self.execute_module(failed=True)
+
     def test_fos_config_save(self):
         set_module_args(dict(save=True))
+        self.get_config.side_effect = lambda module, source='running': (
+            self.running_config if source == 'running' else '!\nhostname "admin"')
         self.execute_module(changed=True)
         self.assertEqual(self.run_commands.call_count, 1)
-        self.assertEqual(self.get_config.call_count, 0)
+        self.assertEqual(self.get_config.call_count, 2)
         self.assertEqual(self.load_config.call_count, 0)
         args = self.run_commands.call_args[0][1]
         self.assertDictContainsSubset({'command': 'copy system:running-config nvram:startup-config'}, args[0])
+
+    def test_fos_config_save_unchanged(self):
+        set_module_args(dict(save=True))
+        self.get_config.side_effect = lambda module, source='running': (
+            self.running_config if source == 'running' else '!Startup Configuration\n' + self.running_config + '\n\n')
+        self.execute_module()
+        self.assertEqual(self.run_commands.call_count, 0)
+
+    def test_fos_config_save_async(self):
+        set_module_args(dict(save=True, save_async=True, src='foo'))
+        with patch('ansible_collections.fujitsu.fos.plugins.modules.fos_config.start_save') as start_save:
+            start_save.return_value = 'abc'
+            with patch.object(self.module, 'get_candidate_config', return_value='hostname sw1'):
+                result = self.execute_module(changed=True, commands=['hostname sw1'])
+        self.assertEqual('abc', result['save_token'])
+        self.assertNotIn('saved', result)
+        self.assertEqual(self.run_commands.call_count, 0)
+
+    def test_fos_config_diff(self):
+        lines = ['clock timezone 8 minutes 0', 'ip routing']
+        set_module_args(dict(lines=lines, _ansible_diff=True))
+        result = self.execute_module(changed=True, commands=['clock timezone 8 minutes 0'])
+        self.assertEqual(self.running_config, result['diff']['before'])
+        self.assertIn('\nclock timezone 8 minutes 0\n', result['diff']['after'])
+        self.assertNotIn('clock timezone 9 minutes 0', result['diff']['after'])
+        self.conn.get_config.assert_not_called()
+        self.assertEqual(self.get_config.call_count, 1)
+        self.assertEqual(self.run_commands.call_count, 0)
+
+    def test_fos_config_diff_unmodelled(self):
+        self.conn.get_config.return_value = self.running_config + '\nip default-gateway 10.0.0.1'
+        set_module_args(dict(lines=['ip default-gateway 10.0.0.1'], _ansible_diff=True))
+        result = self.execute_module(changed=True, commands=['ip default-gateway 10.0.0.1'])
+        self.assertEqual(self.running_config, result['diff']['before'])
+        self.assertEqual(self.running_config + '\nip default-gateway 10.0.0.1', result['diff']['after'])
+        self.conn.get_config.assert_called_once_with(source='running')
+
+    def test_fos_config_resume(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        checkpoint = os.path.join(path, 'sw1.push')
+        commands = ['hostname sw1', 'interface 0/1', 'lldp transmit', 'exit']
+        digest = hashlib.sha1('\n'.join(commands).encode()).hexdigest()
+        write_checkpoint(checkpoint, digest, 2)
+
+        set_module_args(dict(src='foo', checkpoint=checkpoint, resume=True))
+        with patch.object(self.module, 'get_candidate_config', return_value='\n'.join(commands)):
+            result = self.execute_module(commands=commands, sort=False)
+        self.assertEqual(2, result['resumed_at'])
+        self.conn.edit_config.assert_called_once_with(candidate=commands, checkpoint=checkpoint, digest=digest, start=2, modes=None)
+
+    def test_fos_config_resume_unknown_mode(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        checkpoint = os.path.join(path, 'sw1.push')
+        commands = ['hostname sw1', 'vlan database', 'vlan 10', 'vlan 20', 'exit']
+        digest = hashlib.sha1('\n'.join(commands).encode()).hexdigest()
+        write_checkpoint(checkpoint, digest, 3)
+
+        set_module_args(dict(src='foo', checkpoint=checkpoint, resume=True))
+        with patch.object(self.module, 'get_candidate_config', return_value='\n'.join(commands)):
+            result = self.execute_module(commands=commands, sort=False)
+        self.assertNotIn('resumed_at', result)
+        self.conn.edit_config.assert_called_once_with(candidate=commands, checkpoint=checkpoint, digest=digest, start=0, modes=None)
+
+    def test_fos_config_resume_requires_checkpoint(self):
+        set_module_args(dict(src='foo', resume=True))
+        self.execute_module(failed=True)
+
+    def test_fos_config_queue(self):
+        set_module_args(dict(lines=['lldp receive'], parents=['interface 0/14'], queue=True))
+        with patch('ansible_collections.fujitsu.fos.plugins.modules.fos_config.queue_config') as queue_config:
+            queue_config.return_value = '5d0b6c1e9a8f4f6f8e2f0a3c7b1d9e42'
+            result = self.execute_module()
+        self.assertEqual('5d0b6c1e9a8f4f6f8e2f0a3c7b1d9e42', result['queue_id'])
+        self.assertEqual(['interface 0/14'], queue_config.call_args[1]['path'])
+        self.assertEqual(self.get_config.call_count, 0)
+        self.assertEqual(self.load_config.call_count, 0)
+
+    def test_fos_config_queue_save(self):
+        set_module_args(dict(lines=['hostname sw1'], queue=True, save=True))
+        self.execute_module(failed=True)
+
+    def test_fos_config_offline(self):
+        set_module_args(dict(lines=['hostname sw1', 'ip routing'], running_config=self.running_config, _ansible_check_mode=True))
+        self.get_connection.reset_mock()
+        self.execute_module(changed=True, commands=['hostname sw1'])
+        self.assertEqual(self.get_connection.call_count, 0)
+        self.assertEqual(self.get_config.call_count, 0)
+
+    def test_fos_config_src_diff_before_push(self):
+        calls = list()
+        self.get_config.side_effect = lambda *args, **kwargs: calls.append('get_config') or self.running_config
+        self.conn.edit_config.side_effect = lambda *args, **kwargs: calls.append('edit_config')
+        set_module_args(dict(src='foo', _ansible_diff=True))
+        with patch.object(self.module, 'get_candidate_config', return_value='hostname sw1'):
+            result = self.execute_module(changed=False, commands=['hostname sw1'])
+        self.assertEqual(['get_config', 'edit_config'], calls)
+        self.assertEqual(self.running_config, result['diff']['before'])
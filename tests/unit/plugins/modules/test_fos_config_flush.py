@@ -0,0 +1,61 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.plugins.modules import fos_config_flush
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import set_module_args
+from .fos_module import TestFosModule
+
+
+class TestFosConfigFlushModule(TestFosModule):
+
+    module = fos_config_flush
+
+    def setUp(self):
+        super(TestFosConfigFlushModule, self).setUp()
+
+        self.mock_flush_config = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_config_flush.flush_config')
+        self.flush_config = self.mock_flush_config.start()
+
+        self.mock_run_commands = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_config_flush.run_commands')
+        self.run_commands = self.mock_run_commands.start()
+
+    def tearDown(self):
+        super(TestFosConfigFlushModule, self).tearDown()
+        self.mock_flush_config.stop()
+        self.mock_run_commands.stop()
+
+    def test_fos_config_flush(self):
+        results = [dict(id='a1', changed=True, commands=['hostname sw1']), dict(id='b2', changed=False, commands=[])]
+        self.flush_config.return_value = dict(commands=['hostname sw1'], results=results)
+        set_module_args(dict(queue_ids=['a1', 'b2'], save=True))
+        result = self.execute_module(changed=True)
+        self.assertEqual(['a1', 'b2'], self.flush_config.call_args[0][1])
+        self.assertEqual(['hostname sw1'], result['commands'])
+        self.assertEqual(results, result['results'])
+        self.assertTrue(result['saved'])
+
+    def test_fos_config_flush_empty(self):
+        self.flush_config.return_value = dict(commands=[], results=[])
+        set_module_args(dict(save=True))
+        result = self.execute_module()
+        self.assertNotIn('saved', result)
+        self.run_commands.assert_not_called()
@@ -22,6 +22,9 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 import json
+import os
+import shutil
+import tempfile
 
 from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
 from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import set_module_args
@@ -90,3 +93,65 @@ class TestFosFacts(TestFosModule):
         self.assertEquals(3949, ansible_facts['ansible_net_memtotal_mb'])
         self.assertEquals('ET-7648BRA-FOS', ansible_facts['ansible_net_model'])
         self.assertEquals('00:30:AB:F4:CA:DA', ansible_facts['ansible_net_burned_in_mac'])
+
+    def test_fos_facts_gather_subset_all_single_batch(self):
+        set_module_args({'gather_subset': 'all'})
+        result = self.execute_module()
+        ansible_facts = result['ansible_facts']
+        self.assertEqual(self.run_command.call_count, 1)
+        commands = self.run_command.call_args[1]['commands']
+        self.assertEqual(len(commands), len(set(commands)))
+        self.assertEqual('admin', ansible_facts['ansible_net_hostname'])
+        self.assertEqual('ET-7648BRA-FOS', ansible_facts['ansible_net_model'])
+        self.assertIn('ansible_net_config', ansible_facts)
+
+    def test_fos_facts_planner_shares_commands(self):
+        self.load_fixtures()
+        instances = [fos_facts.Default(None), fos_facts.Default(None)]
+        fos_facts.FactsPlanner(None, instances).run()
+        self.assertEqual(self.run_command.call_args[1]['commands'], ['show version', 'show hosts'])
+        self.assertEqual(instances[0].facts, instances[1].facts)
+
+    def test_fos_facts_cache_dir(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        set_module_args({'gather_subset': 'all', 'cache_dir': cache_dir, 'cache_key': 'switch1'})
+        first = self.execute_module()
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, 'switch1.json')))
+
+        self.run_command.reset_mock()
+        second = self.execute_module()
+        commands = [cmd for call in self.run_command.call_args_list for cmd in call[1]['commands']]
+        self.assertEqual(sorted(commands), ['show process cpu', 'show running-config'])
+        self.assertEqual(first['ansible_facts'], second['ansible_facts'])
+
+        with patch.object(fos_facts.Default, 'parse') as parse:
+            third = self.execute_module()
+        parse.assert_not_called()
+        self.assertEqual(first['ansible_facts'], third['ansible_facts'])
+
+    def test_fos_facts_cache_dir_without_config(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        set_module_args({'cache_dir': cache_dir, 'cache_key': 'switch1'})
+        result = self.execute_module()
+        commands = [cmd for call in self.run_command.call_args_list for cmd in call[1]['commands']]
+        self.assertNotIn('show running-config', commands)
+        self.assertFalse(os.path.exists(os.path.join(cache_dir, 'switch1.json')))
+        self.assertIn('The cache directory is only used when the config subset is gathered.', result['warnings'])
+
+    def test_fos_facts_cache_key_required(self):
+        set_module_args({'cache_dir': '/tmp'})
+        self.execute_module(failed=True)
+
+    def test_fos_facts_config_checksum(self):
+        set_module_args({'gather_subset': 'config', 'result_format': 'checksum'})
+        result = self.execute_module()
+        ansible_facts = result['ansible_facts']
+        self.assertNotIn('ansible_net_config', ansible_facts)
+        self.assertEqual(len(ansible_facts['ansible_net_config_checksum']), 40)
+
+    def test_fos_facts_config_filter(self):
+        set_module_args({'gather_subset': 'config', 'filter': '^hostname'})
+        result = self.execute_module()
+        self.assertEqual('hostname "admin"', result['ansible_facts']['ansible_net_config'])
@@ -0,0 +1,59 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.plugins.modules import fos_preflight
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import set_module_args
+from .fos_module import TestFosModule
+
+
+class TestFosPreflightModule(TestFosModule):
+
+    module = fos_preflight
+
+    def setUp(self):
+        super(TestFosPreflightModule, self).setUp()
+
+        self.mock_probe_hosts = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_preflight.probe_hosts')
+        self.probe_hosts = self.mock_probe_hosts.start()
+
+    def tearDown(self):
+        super(TestFosPreflightModule, self).tearDown()
+        self.mock_probe_hosts.stop()
+
+    def test_fos_preflight(self):
+        self.probe_hosts.return_value = {
+            'sw1': dict(reachable=True),
+            'sw2:2222': dict(reachable=False),
+            'sw3': dict(reachable=True),
+        }
+        set_module_args(dict(targets=['sw1', 'sw2:2222', dict(name='sw3', host='192.168.1.3')], timeout=1))
+        result = self.execute_module()
+
+        targets = self.probe_hosts.call_args[0][0]
+        self.assertEqual([('sw1', 'sw1', 22), ('sw2:2222', 'sw2', 2222), ('sw3', '192.168.1.3', 22)], targets)
+        self.assertEqual(['sw1', 'sw3'], result['reachable'])
+        self.assertEqual(['sw2:2222'], result['unreachable'])
+
+    def test_fos_preflight_invalid_port(self):
+        set_module_args(dict(targets=['sw1:ssh']))
+        self.execute_module(failed=True)
@@ -0,0 +1,53 @@
+# Copyright 2020 FUJITSU LIMITED.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.fujitsu.fos.tests.unit.compat.mock import patch
+from ansible_collections.fujitsu.fos.plugins.modules import fos_save_status
+from ansible_collections.fujitsu.fos.tests.unit.plugins.modules.utils import set_module_args
+from .fos_module import TestFosModule
+
+
+class TestFosSaveStatusModule(TestFosModule):
+
+    module = fos_save_status
+
+    def setUp(self):
+        super(TestFosSaveStatusModule, self).setUp()
+
+        self.mock_get_save_status = patch('ansible_collections.fujitsu.fos.plugins.modules.fos_save_status.get_save_status')
+        self.get_save_status = self.mock_get_save_status.start()
+
+    def tearDown(self):
+        super(TestFosSaveStatusModule, self).tearDown()
+        self.mock_get_save_status.stop()
+
+    def test_fos_save_status_saved(self):
+        self.get_save_status.return_value = dict(saved=True, token='abc', elapsed=4.2)
+        set_module_args(dict(token='abc'))
+        result = self.execute_module()
+        self.assertTrue(result['saved'])
+        self.assertEqual('abc', self.get_save_status.call_args[0][1])
+
+    def test_fos_save_status_failed(self):
+        self.get_save_status.return_value = dict(saved=False, token='abc', elapsed=1.0, msg='% Error')
+        set_module_args(dict())
+        result = self.execute_module(failed=True)
+        self.assertEqual('% Error', result['msg'])